@@ -0,0 +1,86 @@
+"""
+Per-row remove_emojis + regex chains (as the ETLs did) vs textclean.clean_frame.
+
+Builds an insta-shaped frame where every account's bio repeats on each of its
+post rows, and reports rows/sec for both paths. No database needed.
+
+    python benchmarks/bench_clean.py --sizes 10000 100000 --posts-per-user 10
+"""
+import argparse
+import os
+import sys
+import time
+
+import emoji
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import textclean
+
+SNIPPETS = [
+    "Lagos based creator 🎥✨ | bookings: mgmt@example.com",
+    "Fashion & beauty 💄 #NaijaStyle follow @bestie_ng https://linktr.ee/someone",
+    "Comedian 😂😂 new skit out now!! www.youtube.com/@funny",
+    "God first 🙏🏽 | Actor | Abuja ➡️ London",
+    "Plain bio without anything special",
+]
+
+
+def make_rows(n: int, posts_per_user: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    users = np.arange(n) // posts_per_user
+    return pd.DataFrame({
+        "name": [f"Creator {u} ⭐" for u in users],
+        "bio": [f"{SNIPPETS[u % len(SNIPPETS)]} {u}" for u in users],
+        "post_caption": [
+            f"{SNIPPETS[i % len(SNIPPETS)]} post {i} @friend{i % 50} 🔥 https://t.co/{i}"
+            for i in rng.permutation(n)
+        ],
+    })
+
+
+def remove_emojis(text: str) -> str:
+    return emoji.replace_emoji(text, replace="")
+
+
+def legacy(df: pd.DataFrame) -> pd.DataFrame:
+    """The chain insta.py ran before textclean (yt/xuser/tik had shorter variants of it)."""
+    df = df.copy()
+    df['bio'] = df['bio'].astype(str).str.replace("/", "", regex=True)
+    df['bio'] = df['bio'].astype(str).replace(r'@\w+', ' ', regex=True).apply(remove_emojis)
+    df['bio'] = df['bio'].str.replace('|', ' ').str.replace('#', ' ').str.replace('&', ' ')
+    df['post_caption'] = df['post_caption'].astype(str).replace(r'@\w+', '', regex=True)
+    df['post_caption'] = df['post_caption'].astype(str).replace(r'http\S+|www\S+|https\S+', '', regex=True).apply(remove_emojis)
+    df['name'] = df['name'].fillna('').astype(str).apply(remove_emojis)
+    return df
+
+
+def current(df: pd.DataFrame) -> pd.DataFrame:
+    return textclean.clean_frame(df, {"bio": "text", "post_caption": "text", "name": "emoji"})
+
+
+def timed(fn, df) -> float:
+    started = time.perf_counter()
+    fn(df)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--posts-per-user", type=int, default=10)
+    args = parser.parse_args()
+
+    textclean.pattern("text"), textclean.pattern("emoji")  # compile outside the timings
+    print(f"{'rows':>10} {'legacy rows/s':>15} {'textclean rows/s':>17} {'speedup':>8}")
+    for n in args.sizes:
+        df = make_rows(n, args.posts_per_user)
+        old = timed(legacy, df)
+        new = timed(current, df)
+        print(f"{n:>10} {n / old:>15,.0f} {n / new:>17,.0f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Memory per ingested post: denormalised per-row dicts (as yt.py built them)
+vs records.Batch with channels and videos kept separate.
+
+Strings are generated fresh per value, as they are when parsed from API JSON,
+so neither side benefits from interning. No database or network needed.
+
+    python benchmarks/bench_records.py --channels 1000 --videos-per-channel 10
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import records
+
+
+def channel(i: int) -> dict:
+    return {
+        "channel_id": f"UC{i:022d}",
+        "channel_title": f"Channel {i}",
+        "channel_description": f"About channel {i}: " + "lorem ipsum dolor sit amet " * 8,
+        "channel_created_at": "2019-05-01T10:00:00Z",
+        "profile_url": f"https://www.youtube.com/@creator{i}",
+        "thumbnail_url": f"https://yt3.ggpht.com/{i:040d}=s800-c-k-c0x00ffffff-no-rj",
+        "subscriber_count": 1000 + i,
+        "total_video_count": 200 + i,
+        "total_view_count": 100_000 + i,
+        "uploads_playlist_id": f"UU{i:022d}",
+    }
+
+
+def video(i: int, j: int) -> dict:
+    return {
+        "video_id": f"{i:06d}{j:05d}",
+        "video_title": f"Video {j} of channel {i}",
+        "video_description": f"Video {j} description " + "consectetur adipiscing elit " * 6,
+        "video_published_at": "2026-09-01T12:00:00Z",
+        "video_url": f"https://www.youtube.com/watch?v={i:06d}{j:05d}",
+    }
+
+
+def legacy(channels: int, per_channel: int) -> list[dict]:
+    rows = []
+    for i in range(channels):
+        details = channel(i)
+        for j in range(per_channel):
+            rows.append({**details, "username": f"creator{i}", **video(i, j), "video_views": j,
+                         "video_likes": j, "video_comments": j,
+                         "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()})
+    return rows
+
+
+def batched(channels: int, per_channel: int) -> tuple:
+    channel_batch = records.Batch(records.YoutubeChannel)
+    video_batch = records.Batch(records.YoutubeVideo)
+    for i in range(channels):
+        details = channel(i)
+        channel_batch.append(records.YoutubeChannel(username=f"creator{i}", **details))
+        now = datetime.utcnow()
+        for j in range(per_channel):
+            video_batch.append(records.YoutubeVideo(
+                channel_id=details["channel_id"], **video(i, j), video_views=j, video_likes=j,
+                video_comments=j, created_at=now, updated_at=now,
+            ))
+    return channel_batch, video_batch
+
+
+def measure(build, *args) -> int:
+    tracemalloc.start()
+    result = build(*args)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--channels", type=int, default=1000)
+    parser.add_argument("--videos-per-channel", type=int, default=10)
+    args = parser.parse_args()
+
+    posts = args.channels * args.videos_per_channel
+    old = measure(legacy, args.channels, args.videos_per_channel)
+    new = measure(batched, args.channels, args.videos_per_channel)
+    print(f"{posts} posts")
+    print(f"per-row dicts : {old / posts:>8,.0f} bytes/post")
+    print(f"record batches: {new / posts:>8,.0f} bytes/post ({old / new:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Legacy executemany upsert vs COPY + staging-table merge (loader.bulk_upsert).
+
+Runs against the database configured by the usual DB_* variables, writing
+only to session temp tables shaped like insta_post_data.
+
+    python benchmarks/bench_upsert.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import loader
+
+LEGACY_SQL = """
+    INSERT INTO bench_insta_post(
+        post_id, post_caption, like_count, comments_count, timestamp, post_media_url, post_permalink, user_id
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (post_id) DO UPDATE SET
+        post_caption = EXCLUDED.post_caption,
+        like_count = EXCLUDED.like_count,
+        comments_count = EXCLUDED.comments_count,
+        timestamp = EXCLUDED.timestamp,
+        post_media_url = EXCLUDED.post_media_url,
+        post_permalink = EXCLUDED.post_permalink,
+        user_id = EXCLUDED.user_id
+"""
+
+
+def make_posts(n: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    ids = np.arange(n)
+    start = datetime(2025, 1, 1)
+    return pd.DataFrame({
+        "post_id": [f"p{i}" for i in ids],
+        "post_caption": [f"caption {i} lagos fashion week" for i in ids],
+        "like_count": rng.integers(0, 1_000_000, n),
+        "comments_count": rng.integers(0, 10_000, n),
+        "timestamp": [start + timedelta(minutes=int(i)) for i in ids],
+        "post_media_url": [f"https://cdn.example.com/{i}.jpg" for i in ids],
+        "post_permalink": [f"https://www.instagram.com/p/{i}/" for i in ids],
+        "user_id": [f"u{i % max(n // 10, 1)}" for i in ids],
+    })
+
+
+def legacy(cur, df: pd.DataFrame):
+    records = [(
+        str(row["post_id"]), str(row["post_caption"]), int(row["like_count"]), int(row["comments_count"]),
+        row["timestamp"], str(row["post_media_url"]), str(row["post_permalink"]), str(row["user_id"]),
+    ) for _, row in df.iterrows()]
+    cur.executemany(LEGACY_SQL, records)
+
+
+def bulk(cur, df: pd.DataFrame):
+    loader.bulk_upsert(cur, "bench_insta_post", df, ["post_id"])
+
+
+def timed(conn, fn, df) -> float:
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE bench_insta_post")
+        conn.commit()
+        started = time.perf_counter()
+        fn(cur, df)
+        conn.commit()
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=100_000,
+                        help="skip the executemany path above this many rows")
+    args = parser.parse_args()
+
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("CREATE TEMP TABLE bench_insta_post (LIKE insta_post_data INCLUDING ALL)")
+        conn.commit()
+
+        print(f"{'rows':>10} {'path':>8} {'seconds':>9} {'rows/s':>10}")
+        for n in args.sizes:
+            df = make_posts(n)
+            for name, fn in (("legacy", legacy), ("copy", bulk)):
+                if name == "legacy" and n > args.legacy_max:
+                    print(f"{n:>10} {name:>8} {'skipped':>9}")
+                    continue
+                seconds = timed(conn, fn, df)
+                print(f"{n:>10} {name:>8} {seconds:>9.2f} {n / seconds:>10.0f}")
+    db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
+
+# Hardening flags from tik.py; harmless for the Google / YouTube / X lookups in srh.py
+LAUNCH_ARGS = [
+    '--disable-gpu',
+    '--disable-dev-shm-usage',
+    '--disable-setuid-sandbox',
+    '--no-sandbox',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-infobars',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-client-side-phishing-detection',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-features=IsolateOrigins,site-per-process,TranslateUI',
+    '--disable-hang-monitor',
+    '--disable-popup-blocking',
+    '--disable-prompt-on-repost',
+    '--disable-renderer-backgrounding',
+    '--disable-sync',
+    '--hide-scrollbars',
+    '--mute-audio',
+    '--window-size=1366,768',
+]
+
+
+class BrowserPool:
+    """
+    One Chromium process shared by every scraper in the process.
+
+    Each lookup gets its own short-lived context (cookies, user agent and proxy
+    are per context), so launching a browser per username is no longer needed.
+    At most `size` contexts are open at once.
+    """
+
+    def __init__(self, size: int = 4):
+        self.size = size
+        self._semaphore = asyncio.Semaphore(size)
+        self._playwright = None
+        self.browser = None
+
+    async def start(self):
+        from playwright.async_api import async_playwright
+
+        self._playwright = await async_playwright().start()
+        self.browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        logging.info(f"Browser pool ready ({self.size} contexts).")
+
+    @asynccontextmanager
+    async def context(self, **options):
+        """A fresh browser context; `options` go to Browser.new_context (proxy, user_agent, ...)."""
+        async with self._semaphore:
+            context = await self.browser.new_context(**options)
+            try:
+                yield context
+            finally:
+                await context.close()
+
+    async def close(self):
+        if self.browser is not None:
+            await self.browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self.browser = self._playwright = None
+
+
+_pool: BrowserPool | None = None
+_pool_lock: asyncio.Lock | None = None
+
+
+async def get_browser_pool() -> BrowserPool:
+    """Process-wide browser pool, launched on first use (size from BROWSER_POOL_SIZE)."""
+    global _pool, _pool_lock
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            pool = BrowserPool(int(os.getenv("BROWSER_POOL_SIZE", "4")))
+            await pool.start()
+            _pool = pool
+    return _pool
+
+
+async def close_browser_pool():
+    global _pool, _pool_lock
+    if _pool is not None:
+        await _pool.close()
+    _pool = _pool_lock = None
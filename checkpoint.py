@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import tempfile
+import time
+
+
+# ============================== Checkpoint store =====================================
+class Checkpoint:
+    """
+    Durable progress record for a discovery run.
+
+    Discovery progress is kept per keyword (next Google page to fetch and the
+    usernames found so far); resolution progress is kept per username and per
+    platform, so a platform that already answered is not searched again.
+    The state is written atomically to a JSON file so a killed run never leaves
+    a half-written checkpoint behind. Discovery pages are flushed as they
+    finish; the much more frequent resolution updates are flushed at most every
+    `flush_interval` seconds (and by the final `flush` of a run).
+    """
+
+    def __init__(self, path: str, flush_interval: float = 5.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.state = {"discovery": {}, "resolution": {}}
+        self.resumed = False
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.state["discovery"] = state.get("discovery", {})
+            self.state["resolution"] = state.get("resolution", {})
+            self.resumed = bool(self.state["discovery"] or self.state["resolution"])
+            logging.info(
+                f"Resuming from checkpoint {self.path}: "
+                f"{len(self.state['discovery'])} keywords, {len(self.state['resolution'])} usernames"
+            )
+        except Exception as e:
+            logging.error(f"Unreadable checkpoint {self.path}, starting fresh: {e}")
+
+    def flush(self):
+        """Write the state to disk if anything changed since the last flush."""
+        if not self._dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".checkpoint-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, indent=1, sort_keys=True)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        except Exception as e:
+            logging.error(f"Error writing checkpoint {self.path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def flush_due(self):
+        """Flush only if the last write is older than `flush_interval`."""
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def clear(self):
+        """Drop the checkpoint once a run has finished completely."""
+        self.state = {"discovery": {}, "resolution": {}}
+        self._dirty = False
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    # ----------------------------- discovery -----------------------------
+    def keyword(self, keyword: str) -> dict:
+        return self.state["discovery"].setdefault(
+            keyword, {"next_page": 0, "done": False, "usernames": []}
+        )
+
+    def record_page(self, keyword: str, page: int, found: list):
+        entry = self.keyword(keyword)
+        entry["next_page"] = page
+        entry["usernames"] = list(dict.fromkeys(entry["usernames"] + found))
+        self._dirty = True
+        self.flush()
+
+    def finish_keyword(self, keyword: str):
+        self.keyword(keyword)["done"] = True
+        self._dirty = True
+        self.flush()
+
+    def discovered(self) -> list:
+        found = []
+        for entry in self.state["discovery"].values():
+            found.extend(entry.get("usernames", []))
+        return list(dict.fromkeys(found))
+
+    # ----------------------------- resolution -----------------------------
+    def resolved(self, username: str) -> dict:
+        """Platforms already answered for `username`, mapped to the handle found (or None)."""
+        return self.state["resolution"].get(username, {}).get("platforms", {})
+
+    def record_platform(self, username: str, platform: str, handle):
+        entry = self.state["resolution"].setdefault(username, {"platforms": {}, "saved": False})
+        entry["platforms"][platform] = handle
+        self._dirty = True
+        self.flush_due()
+
+    def mark_saved(self, username: str):
+        entry = self.state["resolution"].setdefault(username, {"platforms": {}, "saved": False})
+        entry["saved"] = True
+        self._dirty = True
+        self.flush_due()
+
+    def is_saved(self, username: str) -> bool:
+        return self.state["resolution"].get(username, {}).get("saved", False)
+
+
+# ============================== Deadline =====================================
+class Deadline:
+    """Wall-clock budget for a run; `reserve` seconds are kept back for flushing state."""
+
+    def __init__(self, budget_seconds: float | None, reserve: float = 120.0):
+        self.budget = budget_seconds
+        self.reserve = reserve
+        self.started = time.monotonic()
+
+    @classmethod
+    def from_env(cls, name: str = "SEARCH_TIME_BUDGET", reserve: float = 120.0):
+        value = os.getenv(name)
+        if not value:
+            return cls(None, reserve)
+        try:
+            return cls(float(value), reserve)
+        except ValueError:
+            logging.error(f"Invalid {name}={value!r}, running without a deadline")
+            return cls(None, reserve)
+
+    def remaining(self) -> float | None:
+        """Seconds left before the reserve kicks in, or None when unbounded."""
+        if self.budget is None:
+            return None
+        return self.budget - self.reserve - (time.monotonic() - self.started)
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
@@ -0,0 +1,193 @@
+"""
+Single entry point for the pipeline.
+
+Only argparse and the standard library are imported here; each subcommand
+imports its modules (and through them pandas, duckdb, playwright, ...) when
+it runs, so `--help`, `--dry-run` and one-off debugging start instantly.
+
+    python cli.py search
+    python cli.py etl instagram --user some_handle
+    python cli.py etl youtube --dry-run
+    python cli.py pipeline instagram youtube
+    python cli.py queue work tiktok
+    python cli.py landing replay youtube --since 2026-09-01
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import date
+
+PLATFORMS = ["instagram", "youtube", "tiktok", "x"]
+
+
+# ============================== Commands =====================================
+def cmd_search(args):
+    import srh
+
+    asyncio.run(srh.run_search(parallel_limit=args.parallel))
+
+
+def cmd_etl(args):
+    if args.dry_run and args.user:
+        print(f"{args.platform}: would refresh {', '.join(args.user)}")
+        return
+
+    import importlib
+
+    import db
+    import metrics
+    import scheduler
+    from orchestrator import read_usernames
+    from workqueue import HANDLERS
+
+    try:
+        usernames = args.user or scheduler.plan(args.platform, read_usernames()[args.platform], args.limit)
+        if args.dry_run:
+            print(f"{args.platform}: would refresh {len(usernames)} accounts")
+            print("\n".join(usernames))
+            return
+        module, function = HANDLERS[args.platform]
+        getattr(importlib.import_module(module), function)(usernames)
+        if not args.user:
+            metrics.refresh(args.platform)
+    finally:
+        db.close_pool()
+
+
+def cmd_pipeline(args):
+    from orchestrator import Pipeline
+
+    results = asyncio.run(Pipeline(args.stages or ["search", *PLATFORMS]).run())
+    return 0 if all(outcome == "ok" for outcome in results.values()) else 1
+
+
+def cmd_queue(args):
+    import db
+    import metrics
+    import workqueue
+
+    try:
+        if args.action == "status":
+            print(workqueue.status().to_string(index=False))
+        for platform in args.platforms or PLATFORMS:
+            if args.action == "seed":
+                workqueue.seed(platform)
+            elif args.action == "work" and workqueue.work(platform, args.batch):
+                metrics.refresh(platform)
+    finally:
+        db.close_pool()
+
+
+def cmd_metrics(args):
+    import db
+    import metrics
+
+    try:
+        for platform in args.platforms or PLATFORMS:
+            metrics.refresh(platform)
+    finally:
+        db.close_pool()
+
+
+def cmd_find(args):
+    import db
+    import profiles
+
+    try:
+        print(profiles.find(args.handle).to_string(index=False))
+    finally:
+        db.close_pool()
+
+
+def cmd_niche(args):
+    import db
+    import fts
+
+    try:
+        print(fts.search(args.query, args.min_followers, args.max_followers, args.platforms, args.limit)
+              .to_string(index=False))
+    finally:
+        db.close_pool()
+
+
+def cmd_landing(args):
+    import db
+    import landing
+
+    try:
+        if args.action == "push":
+            return 0 if landing.push() else 1
+        if args.action == "prune":
+            landing.prune(args.days)
+            return
+        for platform in args.platforms or PLATFORMS:
+            landing.replay(platform, args.since, args.until)
+    finally:
+        db.close_pool()
+
+
+# ============================== Parser =====================================
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Influencer discovery and ETL pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("search", help="discover Instagram influencers and match their other platforms")
+    p.add_argument("--parallel", type=int, default=3, help="starting concurrency per platform")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("etl", help="refresh one platform's profiles and posts")
+    p.add_argument("platform", choices=PLATFORMS)
+    p.add_argument("--user", action="append", help="only this handle (repeatable); skips the DB read")
+    p.add_argument("--limit", type=int, help="at most this many accounts, by refresh priority")
+    p.add_argument("--dry-run", action="store_true", help="print the accounts that would be refreshed")
+    p.set_defaults(func=cmd_etl)
+
+    p = sub.add_parser("pipeline", help="run discovery and all ETLs in one process")
+    p.add_argument("stages", nargs="*", help="subset of search, " + ", ".join(PLATFORMS))
+    p.set_defaults(func=cmd_pipeline)
+
+    p = sub.add_parser("queue", help="seed or work the ingest_jobs queue")
+    p.add_argument("action", choices=["seed", "work", "status"])
+    p.add_argument("platforms", nargs="*")
+    p.add_argument("--batch", type=int, default=10)
+    p.set_defaults(func=cmd_queue)
+
+    p = sub.add_parser("metrics", help="recompute influencer_metrics")
+    p.add_argument("platforms", nargs="*")
+    p.set_defaults(func=cmd_metrics)
+
+    p = sub.add_parser("find", help="show a person on every platform by any of their handles")
+    p.add_argument("handle")
+    p.set_defaults(func=cmd_find)
+
+    p = sub.add_parser("niche", help="full-text search over bios, captions and tweets")
+    p.add_argument("query")
+    p.add_argument("--min-followers", type=int, default=0)
+    p.add_argument("--max-followers", type=int)
+    p.add_argument("--platform", action="append", dest="platforms", choices=PLATFORMS)
+    p.add_argument("--limit", type=int, default=50)
+    p.set_defaults(func=cmd_niche)
+
+    p = sub.add_parser("landing", help="replay landed raw responses into the tables, prune old ones, or push them to LANDING_REMOTE")
+    p.add_argument("action", choices=["replay", "prune", "push"])
+    p.add_argument("platforms", nargs="*")
+    p.add_argument("--since", type=date.fromisoformat, help="first landing day (YYYY-MM-DD)")
+    p.add_argument("--until", type=date.fromisoformat, help="last landing day (YYYY-MM-DD)")
+    p.add_argument("--days", type=int, help="prune: keep this many days (LANDING_RETENTION_DAYS)")
+    p.set_defaults(func=cmd_landing)
+    return parser
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    args = build_parser().parse_args(argv)
+    # Settings are read when used, so .env is loaded once here instead of by every module on import
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import asyncio
+import contextvars
+import logging
+import time
+from contextlib import asynccontextmanager
+
+
+# ============================== Slot signals =====================================
+class Slot:
+    """One in-flight task; search code flags blocks and errors on it through `report_*`."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.blocked = False
+        self.failed = False
+
+
+_current_slot: contextvars.ContextVar[Slot | None] = contextvars.ContextVar("current_slot", default=None)
+
+
+def report_block(reason: str = ""):
+    """Flag the running task as blocked (CAPTCHA, 429, login wall)."""
+    slot = _current_slot.get()
+    if slot:
+        slot.blocked = True
+    logging.warning(f"Block signal: {reason}")
+
+
+def report_error(reason: str = ""):
+    """Flag the running task as failed without raising."""
+    slot = _current_slot.get()
+    if slot:
+        slot.failed = True
+
+
+# ============================== AIMD limiter =====================================
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one platform.
+
+    Every clean completion under the latency target grows the limit by 1/limit
+    (about +1 per round of tasks); a block, an error rate above `max_error_rate`
+    or a smoothed latency above `target_latency` cuts it by `decrease`, at most
+    once per `cooldown` seconds so one burst of failures counts as one event.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int = 3,
+        minimum: int = 1,
+        maximum: int = 12,
+        target_latency: float = 30.0,
+        max_error_rate: float = 0.3,
+        decrease: float = 0.5,
+        cooldown: float = 15.0,
+    ):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.decrease = decrease
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self.completed = 0
+        self.blocks = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self.history = [(0.0, int(self.limit), "start")]
+        self._last_decrease = float("-inf")
+        self._cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        slot = Slot()
+        token = _current_slot.set(slot)
+        cancelled = False
+        try:
+            yield slot
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception:
+            slot.failed = True
+            raise
+        finally:
+            _current_slot.reset(token)
+            if not cancelled:
+                self.record(time.monotonic() - slot.started, slot.failed, slot.blocked)
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def record(self, latency: float, failed: bool = False, blocked: bool = False):
+        """Feed one completion into the controller and adjust the limit."""
+        self.completed += 1
+        self.errors += failed
+        self.blocks += blocked
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        self.error_rate = 0.8 * self.error_rate + 0.2 * (1.0 if failed or blocked else 0.0)
+
+        if blocked:
+            self._cut("block")
+        elif self.error_rate > self.max_error_rate:
+            self._cut(f"error rate {self.error_rate:.0%}")
+        elif self.latency > self.target_latency:
+            self._cut(f"latency {self.latency:.1f}s")
+        elif not failed:
+            self._set(min(self.maximum, self.limit + 1.0 / self.limit), "increase")
+
+    def _cut(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._set(max(self.minimum, self.limit * self.decrease), reason)
+
+    def _set(self, limit: float, reason: str):
+        changed = int(limit) != int(self.limit)
+        self.limit = limit
+        if changed:
+            elapsed = time.monotonic() - self.started
+            self.history.append((round(elapsed, 1), int(limit), reason))
+            logging.info(f"[{self.name}] concurrency -> {int(limit)} ({reason})")
+
+    def report(self) -> str:
+        """One-line summary of the limits chosen over the run."""
+        timeline = ", ".join(f"{t}s:{limit}" for t, limit, _ in self.history)
+        return (
+            f"[{self.name}] completed={self.completed} errors={self.errors} blocks={self.blocks} "
+            f"final={int(self.limit)} timeline=[{timeline}]"
+        )
@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from psycopg2.pool import ThreadedConnectionPool
+
+
+# ============================== Schema =====================================
+# All tables written by the ETLs; created once per process instead of on every write.
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS username_search(
+        id SERIAL PRIMARY KEY,
+        instagram_username VARCHAR(150),
+        youtube_username VARCHAR(150),
+        tiktok_username VARCHAR(150),
+        x_username VARCHAR(150),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    # One row per Instagram username, so a resumed srh.py run that re-submits a username
+    # (its checkpoint flush lagged the insert) updates the row instead of duplicating it.
+    # Older tables may already hold duplicates: keep the newest before adding the key.
+    """
+    DO $$ BEGIN
+        IF to_regclass('username_search_instagram_username_key') IS NULL THEN
+            DELETE FROM username_search a USING username_search b
+            WHERE a.instagram_username = b.instagram_username AND a.id < b.id;
+            CREATE UNIQUE INDEX username_search_instagram_username_key ON username_search (instagram_username);
+        END IF;
+    END $$;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS insta_user_data(
+        user_id TEXT NOT NULL,
+        username VARCHAR(100) NOT NULL,
+        name VARCHAR(100), profile_url TEXT,
+        follower_count BIGINT, bio TEXT, media_count INT,
+        profile_picture_url TEXT,
+        PRIMARY KEY(user_id)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS insta_post_data(
+        post_id TEXT NOT NULL,
+        post_caption TEXT,
+        like_count BIGINT,
+        comments_count BIGINT,
+        timestamp TIMESTAMP,
+        post_media_url TEXT,
+        post_permalink TEXT,
+        user_id TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES insta_user_data(user_id),
+        PRIMARY KEY(post_id)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS youtube_user_data (
+        channel_id VARCHAR(100) PRIMARY KEY,
+        username VARCHAR(100) NOT NULL,
+        channel_title TEXT,
+        channel_description TEXT,
+        subscriber_count BIGINT,
+        total_view_count BIGINT,
+        total_video_count BIGINT,
+        uploads_playlist_id VARCHAR(100),
+        channel_created_at TIMESTAMP,
+        profile_url Text,
+        thumbnail_url Text
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS youtube_post_data(
+        video_id VARCHAR(100) PRIMARY KEY,
+        channel_id VARCHAR(100),
+        FOREIGN KEY (channel_id) REFERENCES youtube_user_data(channel_id),
+        video_title TEXT,
+        video_description TEXT,
+        video_published_at TIMESTAMP,
+        video_url TEXT,
+        video_views BIGINT,
+        video_likes BIGINT,
+        video_comments BIGINT,
+        created_at TIMESTAMP,
+        updated_at TIMESTAMP
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tiktok_user_data(
+        username VARCHAR(100) NOT NULL,
+        profile_url TEXT,
+        followers BIGINT,
+        total_likes BIGINT,
+        bio TEXT,
+        PRIMARY KEY (username)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tiktok_post_data(
+        username VARCHAR(100) NOT NULL REFERENCES tiktok_user_data(username),
+        video_id VARCHAR(100) NOT NULL,
+        video_url TEXT,
+        video_views INT,
+        PRIMARY KEY (video_id)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS influencer_x(
+        created_at TIMESTAMP,
+        username Text, id Varchar(50) PRIMARY KEY, bio Text, location Text, profile_image_url Text,
+        followers INT, is_verified Boolean, published_at TIMESTAMP, text Text, likes INT, retweets INT,
+        comments_count INT
+    );
+    """,
+    # Append-only metric history (see snapshots.py): range-partitioned by month, BRIN on ts
+    """
+    CREATE TABLE IF NOT EXISTS metric_snapshots(
+        platform TEXT NOT NULL,
+        account TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        ts TIMESTAMPTZ NOT NULL,
+        value BIGINT,
+        PRIMARY KEY (platform, account, metric, ts)
+    ) PARTITION BY RANGE (ts);
+    """,
+    "CREATE INDEX IF NOT EXISTS metric_snapshots_ts_brin ON metric_snapshots USING BRIN (ts);",
+    # Per-account KPIs precomputed by metrics.py for dashboards
+    """
+    CREATE TABLE IF NOT EXISTS influencer_metrics(
+        platform TEXT NOT NULL,
+        account TEXT NOT NULL,
+        handle TEXT,
+        followers BIGINT,
+        posts INT,
+        posts_per_week DOUBLE PRECISION,
+        avg_likes DOUBLE PRECISION,
+        avg_comments DOUBLE PRECISION,
+        median_views DOUBLE PRECISION,
+        engagement_rate DOUBLE PRECISION,
+        likes_per_follower DOUBLE PRECISION,
+        views_per_follower DOUBLE PRECISION,
+        followers_delta_7d BIGINT,
+        followers_delta_30d BIGINT,
+        computed_at TIMESTAMPTZ,
+        PRIMARY KEY (platform, account)
+    );
+    """,
+    # One row per person (normalized Instagram handle) with every platform joined in (see profiles.py).
+    # No foreign key: srh.py drops and recreates username_search on a fresh run.
+    """
+    CREATE TABLE IF NOT EXISTS influencer_profiles(
+        instagram_handle TEXT PRIMARY KEY, instagram_account TEXT, instagram_followers BIGINT,
+        youtube_handle TEXT, youtube_account TEXT, youtube_followers BIGINT,
+        tiktok_handle TEXT, tiktok_account TEXT, tiktok_followers BIGINT,
+        x_handle TEXT, x_account TEXT, x_followers BIGINT,
+        total_followers BIGINT,
+        refreshed_at TIMESTAMPTZ
+    );
+    """,
+    *(
+        f"CREATE INDEX IF NOT EXISTS influencer_profiles_{platform}_handle_idx ON influencer_profiles ({platform}_handle);"
+        for platform in ("youtube", "tiktok", "x")
+    ),
+    # Normalized-handle expression indexes; the expression must match profiles.norm()
+    *(
+        f"CREATE INDEX IF NOT EXISTS {table}_{column}_norm_idx ON {table} (lower(btrim({column}, '@ ')));"
+        for table, column in (
+            ("username_search", "instagram_username"), ("username_search", "youtube_username"),
+            ("username_search", "tiktok_username"), ("username_search", "x_username"),
+            ("insta_user_data", "username"), ("youtube_user_data", "username"),
+            ("tiktok_user_data", "username"), ("influencer_x", "username"),
+        )
+    ),
+    # Who mentions whom in captions, tweets and bios (see mentions.py)
+    """
+    CREATE TABLE IF NOT EXISTS mention_edges(
+        platform TEXT NOT NULL,
+        source_handle TEXT NOT NULL,
+        target_handle TEXT NOT NULL,
+        post_id TEXT NOT NULL,
+        seen_at TIMESTAMPTZ,
+        row_hash TEXT,
+        PRIMARY KEY (platform, source_handle, target_handle, post_id)
+    );
+    """,
+    # Mention candidates that failed verification, skipped by mentions.candidates for a while
+    """
+    CREATE TABLE IF NOT EXISTS mention_candidates(
+        platform TEXT NOT NULL,
+        handle TEXT NOT NULL,
+        rejected_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        reason TEXT,
+        PRIMARY KEY (platform, handle)
+    );
+    """,
+    # Ingestion work queue claimed with FOR UPDATE SKIP LOCKED (see workqueue.py)
+    """
+    CREATE TABLE IF NOT EXISTS ingest_jobs(
+        id BIGSERIAL PRIMARY KEY,
+        platform TEXT NOT NULL,
+        handle TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INT NOT NULL DEFAULT 0,
+        max_attempts INT NOT NULL DEFAULT 3,
+        run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+        leased_by TEXT,
+        lease_expires TIMESTAMPTZ,
+        last_error TEXT,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        updated_at TIMESTAMPTZ DEFAULT now(),
+        UNIQUE (platform, handle)
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS ingest_jobs_pending_idx ON ingest_jobs (platform, run_after, id) WHERE status = 'pending';",
+    "CREATE INDEX IF NOT EXISTS ingest_jobs_lease_idx ON ingest_jobs (platform, lease_expires) WHERE status = 'running';",
+    # Last probed account counters and last full (per-post) fetch (see probe.py)
+    """
+    CREATE TABLE IF NOT EXISTS refresh_state(
+        platform TEXT NOT NULL,
+        handle TEXT NOT NULL,
+        counters JSONB,
+        probed_at TIMESTAMPTZ,
+        full_at TIMESTAMPTZ,
+        PRIMARY KEY (platform, handle)
+    );
+    """,
+    # Newest ingested post per account (ID, timestamp or API paging cursor), see probe.Probe.since
+    "ALTER TABLE refresh_state ADD COLUMN IF NOT EXISTS post_cursor JSONB;",
+    # Content hash of each row's payload, so the bulk loader can skip no-op updates
+    *(
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS row_hash TEXT;"
+        for table in (
+            "insta_user_data", "insta_post_data", "youtube_user_data", "youtube_post_data",
+            "tiktok_user_data", "tiktok_post_data", "influencer_x", "influencer_metrics",
+        )
+    ),
+    # Full-text search over profile and post text (see fts.py). Generated columns keep
+    # the index current on every ETL write without extra work in the loaders.
+    *(
+        statement
+        for table, text in (
+            ("insta_user_data", "coalesce(bio, '')"),
+            ("insta_post_data", "coalesce(post_caption, '')"),
+            ("youtube_user_data", "coalesce(channel_title, '') || ' ' || coalesce(channel_description, '')"),
+            ("tiktok_user_data", "coalesce(bio, '')"),
+            ("influencer_x", "coalesce(bio, '') || ' ' || coalesce(text, '')"),
+        )
+        for statement in (
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_tsv tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('english', {text})) STORED;",
+            f"CREATE INDEX IF NOT EXISTS {table}_search_tsv_idx ON {table} USING GIN (search_tsv);",
+        )
+    ),
+]
+
+
+# ============================== Settings =====================================
+def db_settings() -> dict:
+    """Connection settings from the environment (DB_PASSWORD, or DB_PASS as used by srh/xuser)."""
+    settings = {
+        "host": os.getenv("DB_HOST"),
+        "port": os.getenv("DB_PORT"),
+        "dbname": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USERNAME"),
+        "password": os.getenv("DB_PASSWORD") or os.getenv("DB_PASS"),
+    }
+    missing = [k for k, v in settings.items() if not v]
+    if missing:
+        raise EnvironmentError(f"Missing database settings: {', '.join(missing)}")
+    return settings
+
+
+# ============================== Sync pool (psycopg2) =====================================
+_pool: ThreadedConnectionPool | None = None
+# ThreadedConnectionPool raises PoolError instead of waiting when every connection is out;
+# borrowers take a slot first, so the ETL threads, heartbeats and refreshes queue for one.
+_pool_slots: threading.BoundedSemaphore | None = None
+_pool_lock = threading.Lock()
+_schema_ready = False
+
+
+def pool_size() -> int:
+    return int(os.getenv("DB_POOL_SIZE", "10"))
+
+
+def pool_timeout() -> float:
+    """Seconds a borrower waits for a free connection before giving up."""
+    return float(os.getenv("DB_POOL_TIMEOUT", "300"))
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """Process-wide pool; the first call also runs the schema setup."""
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is None:
+            from psycopg2.pool import ThreadedConnectionPool
+
+            _pool_slots = threading.BoundedSemaphore(pool_size())
+            _pool = ThreadedConnectionPool(
+                minconn=1,
+                maxconn=pool_size(),
+                sslmode="require",
+                **db_settings(),
+            )
+            logging.info("PostgreSQL connection pool ready.")
+    ensure_schema()
+    return _pool
+
+
+@contextmanager
+def pool_slot():
+    """Wait for a free pool connection (DB_POOL_TIMEOUT) instead of failing at once."""
+    from psycopg2.pool import PoolError
+
+    slots = _pool_slots
+    if not slots.acquire(timeout=pool_timeout()):
+        raise PoolError(f"No free database connection after {pool_timeout():.0f}s (DB_POOL_SIZE={pool_size()})")
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection, waiting for one when all are out; commits on success, rolls back on error."""
+    pool = get_pool()
+    with pool_slot():
+        conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn, close=conn.closed != 0)
+
+
+def ensure_schema():
+    """Create every ETL table once per process."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with pool_slot():
+        conn = _pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                for ddl in SCHEMA:
+                    cur.execute(ddl)
+            conn.commit()
+            _schema_ready = True
+            logging.info("Database schema ready.")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            _pool.putconn(conn)
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+# ============================== Async pool (asyncpg) =====================================
+_async_pool = None
+
+
+async def get_async_pool():
+    """Process-wide asyncpg pool; asyncpg prepares and caches statements per connection itself."""
+    global _async_pool
+    if _async_pool is None:
+        import asyncpg
+
+        settings = db_settings()
+        _async_pool = await asyncpg.create_pool(
+            host=settings["host"],
+            port=int(settings["port"]),
+            database=settings["dbname"],
+            user=settings["user"],
+            password=settings["password"],
+            ssl="require",
+            min_size=1,
+            max_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        )
+    return _async_pool
+
+
+async def ensure_schema_async(conn):
+    """Async counterpart of ensure_schema for asyncpg connections."""
+    for ddl in SCHEMA:
+        await conn.execute(ddl)
+
+
+async def close_async_pool():
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
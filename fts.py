@@ -0,0 +1,84 @@
+import argparse
+import logging
+
+import pandas as pd
+
+import db
+
+
+# The search_tsv columns and their GIN indexes are created with the rest of the schema in db.py.
+
+# (platform, source, FROM clause, account, handle, followers, tsvector column)
+SOURCES = [
+    ("instagram", "bio", "insta_user_data u", "u.user_id", "u.username", "u.follower_count", "u.search_tsv"),
+    ("instagram", "caption", "insta_post_data p JOIN insta_user_data u ON u.user_id = p.user_id",
+     "u.user_id", "u.username", "u.follower_count", "p.search_tsv"),
+    ("youtube", "channel", "youtube_user_data u", "u.channel_id", "u.username", "u.subscriber_count", "u.search_tsv"),
+    ("tiktok", "bio", "tiktok_user_data u", "u.username", "u.username", "u.followers", "u.search_tsv"),
+    ("x", "tweet", "influencer_x u", "u.id", "u.username", "u.followers", "u.search_tsv"),
+]
+
+
+def _search_sql(platforms: list[str]) -> str:
+    hits = " UNION ALL ".join(
+        f"""
+        SELECT '{platform}' AS platform, '{source}' AS source, {account}::text AS account,
+               {handle}::text AS handle, {followers}::bigint AS followers,
+               ts_rank_cd({tsv}, q.query) AS rank
+        FROM {from_clause}, q
+        WHERE {tsv} @@ q.query
+          AND {followers} >= %(min_followers)s
+          AND (%(max_followers)s::bigint IS NULL OR {followers} <= %(max_followers)s)
+        """
+        for platform, source, from_clause, account, handle, followers, tsv in SOURCES
+        if platform in platforms
+    )
+    return f"""
+        WITH q AS (SELECT websearch_to_tsquery('english', %(query)s) AS query),
+        hits AS ({hits})
+        SELECT platform, account, max(handle) AS handle, max(followers) AS followers,
+               sum(rank) AS score, count(*) AS matches,
+               string_agg(DISTINCT source, ',') AS matched_in
+        FROM hits
+        GROUP BY platform, account
+        ORDER BY score DESC, followers DESC
+        LIMIT %(limit)s
+    """
+
+
+# ============================== Query API =====================================
+def search(
+    query: str,
+    min_followers: int = 0,
+    max_followers: int | None = None,
+    platforms: list[str] | None = None,
+    limit: int = 50,
+) -> pd.DataFrame:
+    """
+    Ranked niche lookup over bios, channel descriptions, captions and tweets.
+
+    `query` uses web-search syntax ("afrobeats dance -music", "\"lagos food\"").
+    Every branch is a GIN index scan, so this replaces SERP scraping for niches
+    we have already ingested. One row per account, best matches first.
+    """
+    platforms = platforms or sorted({source[0] for source in SOURCES})
+    params = {"query": query, "min_followers": min_followers, "max_followers": max_followers, "limit": limit}
+    with db.connection() as conn:
+        df = pd.read_sql(_search_sql(platforms), conn, params=params)
+    logging.info(f"Niche search '{query}' matched {len(df)} accounts.")
+    return df
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
+    parser = argparse.ArgumentParser(description="Search ingested influencer text")
+    parser.add_argument("query")
+    parser.add_argument("--min-followers", type=int, default=0)
+    parser.add_argument("--max-followers", type=int)
+    parser.add_argument("--platform", action="append", dest="platforms")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    try:
+        print(search(args.query, args.min_followers, args.max_followers, args.platforms, args.limit).to_string(index=False))
+    finally:
+        db.close_pool()
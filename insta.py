@@ -1,10 +1,3 @@
-import requests
-import pandas as pd
-import duckdb
-import psycopg2
-
-from sqlalchemy import create_engine
-import pytz
 import os
 import time
 import random
@@ -13,46 +6,31 @@ from datetime import datetime, timedelta
 from functools import cache
 from typing import List, Dict, Any, Optional
 
-
-import emoji
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# --- config & logging ---
-logging.getLogger().setLevel(level=logging.INFO)
-
+import db
+import landing
+import mentions
+import metrics
+import probe
+import profiles
+import records
+import retry
+import scheduler
+import snapshots
+import transform
+
+# --- config ---
 GRAPH_API = "v23.0"
-FB_PAGE_ID = os.getenv("FB_PAGE_ID")
-ACCESS_TOKEN = os.getenv("FB_TOKEN")
-ig_id = os.getenv("IG_BUSINESS_ID")
 
 
-def remove_emojis(text: str) -> str:
-    """Helper to strip emojis."""
-    return emoji.replace_emoji(text, replace="")
+# Read when used, so a .env loaded by the entry point (cli.py or __main__) is seen
+def fb_page_id() -> Optional[str]:
+    return os.getenv("FB_PAGE_ID")
 
 
-def connect_to_database():
-    """Connect to PostgreSQL."""
-    host = os.getenv("DB_HOST")
-    database = os.getenv("DB_NAME")
-    user = os.getenv("DB_USERNAME")
-    password = os.getenv("DB_PASSWORD")
-    port = os.getenv("DB_PORT")
+def access_token() -> Optional[str]:
+    return os.getenv("FB_TOKEN")
 
-    if not all([host, database, user, password, port]):
-        logging.error("Missing required environment variables for DB connection.")
-        return None
 
-    try:
-        con_str = f"host={host} dbname={database} user={user} password={password} port={port} sslmode=require"
-        conn = psycopg2.connect(con_str)
-        logging.info("Connected to PostgreSQL database successfully.")
-        return conn
-    except Exception as e:
-        logging.error(f"Error connecting to PostgreSQL: {e}")
-        return None
 user_agents = [
     # Chrome - Windows
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.6478.182 Safari/537.36",
@@ -85,13 +63,30 @@ user_agents = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Ubuntu Chromium/124.0.6367.91 Chrome/124.0.6367.91 Safari/537.36"
 ]
 
+def retryable_error(err: dict) -> bool:
+    """Graph API errors worth retrying later: rate limits and the ones the API flags as transient."""
+    msg = err.get("message", "").lower()
+    return (err.get("code") in (1, 2, 4, 17, 32, 613) or bool(err.get("is_transient"))
+            or "rate limit" in msg or "too many" in msg)
+
+
 def request_get(
     url: str,
     params: dict,
     timeout: float = 30.0,
     max_retries: int = 2,
     backoff_factor: float = 1.5,) -> Optional[dict]:
-    """Simple GET with retry/backoff using requests."""
+    """
+    GET with a short inline retry on network errors. Rate limits, 403s and
+    server errors raise retry.RetryLater so the account is parked instead of
+    the whole run sleeping; they also count against the Graph API breaker.
+    Graph API request errors (HTTP 400 and friends, e.g. an unknown account
+    or an expired paging cursor) come back as {"_status": "ERROR", "error": ...}.
+    """
+    import requests
+
+    circuit = retry.breaker("graph_api")
+    circuit.before_call()
     headers = {
         "User-Agent": f"{random.choice(user_agents)}"
     }
@@ -100,33 +95,35 @@ def request_get(
         try:
             resp = requests.get(url, params=params, headers=headers, timeout=timeout)
 
-            if resp.status_code == 200:
-                data = resp.json()
-                if isinstance(data, dict) and "error" in data:
-                    err = data["error"]
-                    code = err.get("code")
-                    msg = err.get("message", "").lower()
-                    if code in (4, 17, 613) or "rate limit" in msg or "too many" in msg:
-                        logging.warning(f"Rate limited: {err}")
-                        return {"_status": "RATE_LIMIT", "error": err}
-                    return {"_status": "ERROR", "error": err}
-                return {"_status": "OK", "data": data}
-            
-
-            elif resp.status_code in (429, 500, 502, 503, 504):
-                logging.warning(f"Retrying ({attempt}/{max_retries}) after status {resp.status_code}")
-                time.sleep(random.uniform(600, 900))
-                continue
-
-            elif resp.status_code == 403:
-                logging.warning("403 Forbidden sleeping for 30s to 1 minute")
-                time.sleep(random.uniform(900, 1200))
-                return None
+            if resp.status_code in (429, 500, 502, 503, 504, 403):
+                retry_after = resp.headers.get("Retry-After")
+                retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+                circuit.failure(retry_after)
+                raise retry.RetryLater(f"Graph API status {resp.status_code}", retry_after)
 
             elif resp.status_code == 443:
                 logging.warning("443 Name not found")
                 return None
 
+            elif resp.status_code == 200 or 400 <= resp.status_code < 500:
+                try:
+                    data = resp.json()
+                except ValueError:
+                    data = None
+                err = data.get("error") if isinstance(data, dict) else None
+                if err:
+                    if retryable_error(err):
+                        circuit.failure()
+                        raise retry.RetryLater(f"Graph API rate limit or transient error: {err.get('message')}")
+                    circuit.success()
+                    return {"_status": "ERROR", "error": err}
+                if resp.status_code == 200 and data is not None:
+                    circuit.success()
+                    return {"_status": "OK", "data": data}
+
+            logging.warning(f"Unexpected status {resp.status_code} for {url}")
+            return None
+
         except requests.Timeout:
             logging.warning(f"Timeout on GET {url} attempt {attempt}")
             time.sleep(backoff_factor ** attempt)
@@ -136,19 +133,19 @@ def request_get(
             time.sleep(backoff_factor ** attempt)
             continue
 
-    logging.error(f"Failed after {max_retries} retries: {url}")
-    return None
+    circuit.failure()
+    raise retry.RetryLater(f"Network failure after {max_retries} tries: {url}")
 
 
 @cache
 def get_instagram_business_id_cached(page_id: str) -> Optional[str]:
     """Retrieve Instagram business ID from Facebook Page ID."""
-    if not page_id or not ACCESS_TOKEN:
+    if not page_id or not access_token():
         logging.error("Missing FB_PAGE_ID or ACCESS_TOKEN.")
         return None
 
     url = f"https://graph.facebook.com/{GRAPH_API}/{page_id}"
-    params = {"fields": "instagram_business_account", "access_token": ACCESS_TOKEN}
+    params = {"fields": "instagram_business_account", "access_token": access_token()}
 
     resp = request_get(url, params)
     if not resp or resp.get("_status") != "OK":
@@ -165,23 +162,26 @@ def get_instagram_business_id_cached(page_id: str) -> Optional[str]:
     return None
 
 
-def fetch_user_and_media(ig_business_id: str, username: str) -> Dict[str, Any]:
-    """Fetch user data and media from Instagram Graph API."""
+USER_FIELDS = "id,username,profile_picture_url,name,biography,followers_count,media_count"
+MEDIA_FIELDS = "id,caption,like_count,comments_count,timestamp,media_url,permalink"
+
+
+def fetch_user_and_media(ig_business_id: str, username: str, with_media: bool = True,
+                         before: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Fetch user data and media from Instagram Graph API. `with_media=False`
+    fetches the account fields only; `before` (a paging cursor) only the media
+    newer than the page it came from.
+    """
     url = f"https://graph.facebook.com/{GRAPH_API}/{ig_business_id}"
-    fields = (
-        f"business_discovery.username({username})"
-        "{id,username,profile_picture_url,name,biography,followers_count,media_count,"
-        "media.limit(10){id,caption,like_count,comments_count,timestamp,media_url,permalink}}"
-    )
-    params = {"fields": fields, "access_token": ACCESS_TOKEN}
+    media = f",media.limit(10){f'.before({before})' if before else ''}{{{MEDIA_FIELDS}}}" if with_media else ""
+    fields = f"business_discovery.username({username}){{{USER_FIELDS}{media}}}"
+    params = {"fields": fields, "access_token": access_token()}
 
     resp = request_get(url, params, timeout=60)
     if not resp:
         return {"status": "NETWORK_FAIL", "username": username}
 
-    if resp.get("_status") == "RATE_LIMIT":
-        return {"status": "RATE_LIMIT", "username": username, "error": resp.get("error")}
-
     if resp.get("_status") == "ERROR":
         return {"status": "API_ERROR", "username": username, "error": resp.get("error")}
 
@@ -192,20 +192,22 @@ def fetch_user_and_media(ig_business_id: str, username: str) -> Dict[str, Any]:
     return {"status": "OK", "username": username, "user": data["business_discovery"]}
 
 
-def process_user(ig_business_id: str, username: str, cutoff_days: int = 180) -> List[Dict[str, Any]]:
-    logging.info(f"Fetching @{username} ...")
-    result = fetch_user_and_media(ig_business_id, username)
-
-    if result["status"] != "OK":
-        logging.info(f"Skipping @{username}: {result['status']}")
-        return []
-
-    user = result["user"]
-    follower_count = user.get("followers_count", 0)
+def parse_user(user: dict, landed_at: datetime, cutoff_days: int = 180):
+    """Profile record and posts from the `cutoff_days` before `landed_at`, from one raw business_discovery payload."""
     media_items = user.get("media", {}).get("data", []) or []
-    cutoff_date = datetime.now(pytz.UTC) - timedelta(days=cutoff_days)
-
-    rows = []
+    cutoff_date = landed_at - timedelta(days=cutoff_days)
+
+    profile = records.InstagramProfile(
+        user_id=user.get("id"),
+        username=user.get("username"),
+        name=user.get("name"),
+        profile_url=f"https://www.instagram.com/{user.get('username')}/",
+        follower_count=user.get("followers_count", 0),
+        bio=user.get("biography"),
+        media_count=user.get("media_count"),
+        profile_picture_url=user.get("profile_picture_url"),
+    )
+    posts = []
     for m in media_items[:10]:  # Limit to 10 posts explicitly
         ts = m.get("timestamp")
         if not ts:
@@ -213,202 +215,202 @@ def process_user(ig_business_id: str, username: str, cutoff_days: int = 180) ->
         dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
         if dt < cutoff_date:  # Skip posts older than cutoff
             continue
-        rows.append({
-            "user_id": user.get("id"),
-            "username": user.get("username"),
-            "profile_url": f"https://www.instagram.com/{user.get('username')}/",
-            "name": user.get("name"),
-            "profile_picture_url": user.get("profile_picture_url"),
-            "bio": user.get("biography"),
-            "follower_count": follower_count,
-            "media_count": user.get("media_count"),
-            "post_id": m.get("id"),
-            "post_caption": m.get("caption"),
-            "like_count": m.get("like_count"),
-            "comments_count": m.get("comments_count"),
-            "timestamp": m.get("timestamp"),
-            "post_media_url": m.get("media_url"),
-            "post_permalink": m.get("permalink"),
-        })
-        
-    return rows
-
-def run_pipeline(usernames: List[str]):
-    """Main ETL pipeline using requests."""
-    
-    ig_business_id = get_instagram_business_id_cached(FB_PAGE_ID)
-    if not ig_business_id:
-        logging.error("Cannot proceed without Instagram Business ID.")
-        return
+        posts.append(records.InstagramPost(
+            post_id=m.get("id"),
+            post_caption=m.get("caption"),
+            like_count=m.get("like_count"),
+            comments_count=m.get("comments_count"),
+            timestamp=ts,
+            post_media_url=m.get("media_url"),
+            post_permalink=m.get("permalink"),
+            user_id=user.get("id"),
+        ))
+    return profile, posts
+
+
+def media_counters(user: dict) -> dict:
+    return {"media_count": user.get("media_count")}
+
+
+def media_cursor(user: dict) -> Optional[dict]:
+    """Paging cursor and timestamp of the newest fetched media item; None when no media came back."""
+    media = user.get("media") or {}
+    if not media.get("data"):
+        return None
+    return {
+        "before": media.get("paging", {}).get("cursors", {}).get("before"),
+        "newest_at": media["data"][0].get("timestamp"),
+    }
 
-    all_rows = []
-    for u in usernames:
-        all_rows.extend(process_user(ig_business_id, u))
-        time.sleep(random.uniform(2, 4))
 
-    if not all_rows:
+def api_error(result: dict) -> str:
+    """Short form of a Graph API error for logs and job errors."""
+    err = result.get("error") or {}
+    return f"({err.get('code')}/{err.get('error_subcode', '-')}) {err.get('message', 'unknown error')}"
+
+
+def fetch_entries(ig_business_id: str, usernames: List[str], refresh: probe.Probe | None = None,
+                  failed: Dict[str, str] | None = None, skipped: Dict[str, str] | None = None):
+    """
+    Fetch and land each account, yielding (username, raw payload, landed_at).
+    Rate-limited accounts are parked and retried later while the rest continue.
+
+    With a `refresh` probe, accounts that are not due get the account fields
+    first; the media edge is only requested when their media_count moved, and
+    then only for media newer than the stored paging cursor. Accounts that
+    could not be fetched are added to `failed` (username -> reason) for a
+    retry; accounts the Graph API rejected (unknown, private, not a business
+    account) go to `skipped` instead, since retrying cannot change the answer.
+    """
+    def fetch(username):
+        logging.info(f"Fetching @{username} ...")
+        due = refresh is None or refresh.due(username)
+        try:
+            result = fetch_user_and_media(ig_business_id, username, with_media=due)
+            if not due and result["status"] == "OK" and refresh.needs_full(username, media_counters(result["user"])):
+                before = (refresh.since(username) or {}).get("before")
+                result = fetch_user_and_media(ig_business_id, username, before=before)
+                if before and result["status"] == "API_ERROR":
+                    # Paging cursors expire (HTTP 400); fall back to the latest page, whose cursor replaces it
+                    logging.info(f"@{username}: stored media cursor rejected ({api_error(result)}), fetching the latest page.")
+                    result = fetch_user_and_media(ig_business_id, username)
+        finally:
+            time.sleep(random.uniform(2, 4))
+        if result["status"] != "OK":
+            reason = f"API_ERROR: {api_error(result)}" if result["status"] == "API_ERROR" else result["status"]
+            logging.info(f"Skipping @{username}: {reason}")
+            if failed is not None and result["status"] == "NETWORK_FAIL":
+                failed[username] = reason
+            elif skipped is not None:
+                skipped[username] = reason
+            return None
+        if refresh is not None:
+            refresh.seen(username, media_counters(result["user"]), due, media_cursor(result["user"]))
+        return result["user"], landing.land("instagram", username, result["user"])
+
+    queue = retry.DeferredQueue("instagram")
+    for username, fetched in queue.run(usernames, fetch):
+        if fetched:
+            yield username, *fetched
+    if failed is not None:
+        failed.update(queue.failed)
+
+
+def to_batches(entries, failed: Dict[str, str] | None = None) -> dict:
+    """Record batches from (username, raw payload, landed_at) entries, live or replayed; unreadable ones go to `failed`."""
+    accounts = records.Batch(records.InstagramProfile)
+    posts = records.Batch(records.InstagramPost)
+    for username, user, landed_at in entries:
+        try:
+            profile, recent = parse_user(user, landed_at)
+        except Exception as e:
+            logging.exception(f"Skipping @{username}, unreadable payload: {e}")
+            if failed is not None:
+                failed[username] = f"unreadable payload: {e}"
+            continue
+        accounts.append(profile)
+        posts.extend(recent)
+    return {"insta_user_data": accounts, "insta_post_data": posts}
+
+
+def mention_edges(accounts: records.Batch, posts: records.Batch):
+    """Mentions in captions (attributed to the post's author) and in bios."""
+    import pandas as pd
+
+    handles = dict(zip(accounts.columns["user_id"], accounts.columns["username"]))
+    captions = posts.frame("user_id", "post_id", "post_caption")
+    captions["username"] = captions["user_id"].map(handles)
+    return pd.concat([
+        mentions.extract(captions, "instagram", "username", {"post_caption": "post_id"}),
+        mentions.extract(accounts.frame("username", "bio"), "instagram", "username", {"bio": None}),
+    ], ignore_index=True)
+
+
+def store(batches: dict, snapshot: bool = True):
+    """
+    Transform and write one set of batches; `snapshot=False` when replaying
+    landed data. Returns True once the rows are written.
+    """
+    accounts, posts = batches["insta_user_data"], batches["insta_post_data"]
+    if not len(accounts):
         logging.info("No influencer rows to write.")
-        return
-
-    df = pd.DataFrame(all_rows)
-    if df.empty:
-        return
-
-    # Clean data
-    df['bio'] = df['bio'].astype(str).str.replace("/", "", regex=True)
-    df['follower_count'] = df['follower_count'].fillna(0).astype(int)
-    df['like_count'] = df['like_count'].fillna(0).astype(int)
-    df['post_id'] = df['post_id'].astype(str)
-    df['comments_count'] = df['comments_count'].fillna(0).astype(int)
-    df['media_count'] = df['media_count'].fillna(0).astype(int)
-    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-    df['profile_picture_url'] = df['profile_picture_url'].astype(str).str.rstrip("/")
-    df['post_media_url'] = df['post_media_url'].astype(str).str.rstrip("/")
-    df['bio'] = df['bio'].astype(str).replace(r'@\w+', ' ', regex=True).apply(remove_emojis)
-    df['post_caption'] = df['post_caption'].astype(str).replace(r'@\w+', '', regex=True)
-    df['post_caption'] = df['post_caption'].astype(str).replace(r'http\S+|www\S+|https\S+', '', regex=True).apply(remove_emojis)
-    df['name'] = df['name'].fillna('').astype(str).apply(remove_emojis)
-    # DuckDB transform
-
-    duck = duckdb.connect()
-    duck.register("df", df)
-    df_cleaned = duck.execute("""
-        SELECT 
-            user_id, username, name, profile_url, follower_count,
-            REPLACE(REPLACE(REPLACE(bio, '|', ' '), '#', ' '), '&', ' ') AS bio,
-            media_count, profile_picture_url, timestamp, post_id,
-            post_caption, like_count, comments_count, post_media_url, post_permalink
-        FROM df
-    """).fetchdf()
-    # Breaking up the table into user data table and post table 
-    df_user = df_cleaned[["user_id", "username", "name", "bio", "profile_url", "follower_count", "media_count"]]
-    df_posts = df_cleaned[["user_id", "post_id", "post_caption", 
-                           "like_count", "comments_count", "timestamp", "post_media_url", "post_permalink"]]
+        return False
+
+    # Mentions are stripped by the transform below, so collect them first
+    edges = mention_edges(accounts, posts)
+    tables = transform.run("instagram", batches)
+    users = tables["insta_user_data"]
     # Write to Postgres
-    conn = connect_to_database()
-    if not conn:
-        return
     try:
-        cur = conn.cursor()
-        # user table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS insta_user_data(
-                user_id TEXT NOT NULL,
-                username VARCHAR(100) NOT NULL, 
-                name VARCHAR(100), profile_url TEXT,
-                follower_count BIGINT, bio TEXT, media_count INT,
-                profile_picture_url TEXT,
-                PRIMARY KEY(user_id)
-            );
-        """)
-
-        # Post table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS insta_post_data(
-                    post_id TEXT NOT NULL,
-                    post_caption TEXT,
-                    like_count BIGINT,
-                    comments_count BIGINT,
-                    timestamp TIMESTAMP,
-                    post_media_url TEXT,
-                    post_permalink TEXT,
-                    user_id TEXT NOT NULL,
-                    FOREIGN KEY (user_id) REFERENCES insta_user_data(user_id),
-                    PRIMARY KEY(post_id)
-            );
-        """)
-        # Upsert user data
-        upsert_user_sql = """
-            INSERT INTO insta_user_data(
-                user_id, username, name, 
-                profile_url, follower_count, bio, media_count, profile_picture_url
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (user_id) DO UPDATE SET
-                username = EXCLUDED.username,
-                name = EXCLUDED.name,
-                profile_url = EXCLUDED.profile_url,
-                follower_count = EXCLUDED.follower_count,
-                bio = EXCLUDED.bio,
-                media_count = EXCLUDED.media_count,
-                profile_picture_url = EXCLUDED.profile_picture_url;
-            """
-
-        # Post_upsert query
-
-        upsert_post_sql = """
-        INSERT INTO insta_post_data(
-            post_id, post_caption, like_count, comments_count, timestamp, post_media_url, post_permalink, user_id
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (post_id) DO UPDATE SET
-            post_caption = EXCLUDED.post_caption,
-            like_count = EXCLUDED.like_count,
-            comments_count = EXCLUDED.comments_count,
-            timestamp = EXCLUDED.timestamp,
-            post_media_url = EXCLUDED.post_media_url,
-            post_permalink = EXCLUDED.post_permalink,
-            user_id = EXCLUDED.user_id
-        """
-        user_records = [(
-            str(row["user_id"]),
-            str(row["username"]),
-            str(row["name"]),
-            str(row["profile_url"]),
-            int(row["follower_count"]),
-            str(row["bio"]),
-            int(row["media_count"]),
-            str(row["profile_picture_url"]),
-        ) for _, row in df_cleaned.iterrows()]
-
-        post_records = [(
-            str(row["post_id"]),
-            str(row["post_caption"]),
-            int(row["like_count"]),
-            int(row["comments_count"]),
-            row["timestamp"],
-            str(row["post_media_url"]),
-            str(row["post_permalink"]),
-            str(row["user_id"])
-        ) for _, row in df_cleaned.iterrows()]
-
-
-        
-        cur.executemany(upsert_user_sql, user_records)
-        cur.executemany(upsert_post_sql, post_records)
-        conn.commit()
-        logging.info(f"Upserted {len(df_cleaned)} rows into influencer_instagram.")
+        transform.load("instagram", tables)
+        logging.info(f"Upserted {len(users)} users and {len(tables['insta_post_data'])} posts into influencer_instagram.")
+        if snapshot:
+            snapshots.record("instagram", users, "user_id", {"followers": "follower_count", "posts": "media_count"})
+        profiles.refresh("instagram", users.column("username").to_pylist())
+        mentions.record(edges)
+        return True
     except Exception as e:
-        conn.rollback()
         logging.exception(f"Database error during upsert.{e}")
-    finally:
-        cur.close()
-        conn.close()
+        return False
+
+
+def run_pipeline(usernames: List[str]) -> Dict[str, str]:
+    """
+    Main ETL pipeline using requests. Returns the usernames that failed and
+    are worth retrying, with the reason; rejected accounts are only logged.
+    """
+    
+    try:
+        ig_business_id = get_instagram_business_id_cached(fb_page_id())
+    except retry.RetryLater as e:
+        logging.error(f"Graph API unavailable: {e}")
+        return {username: f"Graph API unavailable: {e}" for username in usernames}
+    if not ig_business_id:
+        logging.error("Cannot proceed without Instagram Business ID.")
+        return {username: "no Instagram Business ID" for username in usernames}
+
+    failed: Dict[str, str] = {}
+    skipped: Dict[str, str] = {}
+    refresh = probe.Probe("instagram", usernames)
+    batches = to_batches(fetch_entries(ig_business_id, usernames, refresh, failed, skipped), failed)
+    if skipped:
+        # Permanent answers: reported here, not retried by the deferred or work queue
+        logging.warning(f"Skipped {len(skipped)} Instagram accounts the Graph API rejected: "
+                        + "; ".join(f"@{username} {reason}" for username, reason in skipped.items()))
+    if store(batches):
+        refresh.save()
+    elif len(batches["insta_user_data"]):
+        failed.update({
+            username: "database write failed" for username in usernames if username not in failed and username not in skipped
+        })
+    return failed
 
 
-def main(usernames: List[str]):
-    """Entrypoint for pipeline run."""
+def main(usernames: List[str]) -> Dict[str, str]:
+    """Entrypoint for pipeline run; returns the usernames that failed (see run_pipeline)."""
     uniq_usernames = list(dict.fromkeys(usernames))
-    run_pipeline(uniq_usernames)
+    return run_pipeline(uniq_usernames)
 
 
 if __name__ == "__main__":
-    try:
-        # Create SQLAlchemy engine from environment variables
-        conn = psycopg2.connect(
-        host=os.getenv("DB_HOST"),
-        port=os.getenv("DB_PORT"),
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USERNAME"),
-        password=os.getenv("DB_PASSWORD"),
-        sslmode="require")
+    import pandas as pd
+    from dotenv import load_dotenv
 
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
         query = "SELECT instagram_username FROM username_search WHERE instagram_username IS NOT NULL;"
-        names = pd.read_sql(query, conn)
+        with db.connection() as conn:
+            names = pd.read_sql(query, conn)
 
         usernames = (
             names["instagram_username"].astype(str).str.strip().str.lower().dropna().unique().tolist())
 
         logging.info(f"Loaded {len(usernames)} usernames from database.")
-        main(usernames)
+        main(scheduler.plan("instagram", usernames))
+        metrics.refresh("instagram")
 
     except Exception as e:
         logging.error(f"Error reading usernames: {e}")
+    finally:
+        db.close_pool()
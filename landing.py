@@ -0,0 +1,229 @@
+"""
+Landing zone for raw API / HTML responses.
+
+Every fetched payload is appended as one JSON line to
+LANDING_DIR/<platform>/dt=<YYYY-MM-DD>/part-<host>-<pid>.ndjson.gz, before
+it is parsed. Each append is its own gzip member, so a crashed run leaves
+readable files and concurrent workers never share a file. `replay` feeds
+landed payloads back through the platform's parser and the transform stage,
+rebuilding the Postgres tables without calling the APIs again.
+
+The CI runners are thrown away after every job, so when LANDING_REMOTE is
+set (an S3 or S3-compatible prefix, e.g. s3://bucket/landing) the workflows
+`push` the run's part files there, `replay` pulls the days it needs first and
+`prune` applies the retention to the bucket as well. Part file names carry a
+per-process token, so uploads from different runs only ever add files.
+
+    python landing.py push
+    python landing.py replay instagram --since 2026-09-01
+    python landing.py prune --days 90
+"""
+import argparse
+import gzip
+import heapq
+import importlib
+import itertools
+import json
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import threading
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import db
+
+# platform -> ETL module exposing to_batches(entries) and store(batches, snapshot=...)
+MODULES = {"instagram": "insta", "youtube": "yt", "tiktok": "tik", "x": "xuser"}
+
+REPLAY_CHUNK = 1000
+
+_write_lock = threading.Lock()
+# Keeps part names unique across runs: runner hostnames and pids repeat
+_run_token = uuid.uuid4().hex[:8]
+
+
+def root() -> Path:
+    return Path(os.getenv("LANDING_DIR", "landing"))
+
+
+def remote() -> str | None:
+    """Object storage prefix the zone is synced with; unset keeps it on local disk only."""
+    return os.getenv("LANDING_REMOTE", "").rstrip("/") or None
+
+
+def retention_days() -> int:
+    return int(os.getenv("LANDING_RETENTION_DAYS", "90"))
+
+
+def partition(platform: str, day: date) -> Path:
+    return root() / platform / f"dt={day:%Y-%m-%d}"
+
+
+# ============================== Write =====================================
+def land(platform: str, handle: str, payload, landed_at: datetime | None = None) -> datetime:
+    """Append one raw payload; returns its landing time, which the parsers use as 'now'."""
+    landed_at = landed_at or datetime.now(timezone.utc)
+    line = json.dumps({"handle": handle, "landed_at": landed_at.isoformat(), "payload": payload}, default=str)
+    path = partition(platform, landed_at.date()) / f"part-{socket.gethostname()}-{os.getpid()}-{_run_token}.ndjson.gz"
+    try:
+        with _write_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        # Landing is a safety net; never fail the ingest because of it
+        logging.warning(f"Could not land {platform} payload for {handle}: {e}")
+    return landed_at
+
+
+# ============================== Read =====================================
+def partition_day(name: str, since: date | None = None, until: date | None = None) -> date | None:
+    """The day of a dt=YYYY-MM-DD partition name, or None when it is malformed or outside [since, until]."""
+    try:
+        day = date.fromisoformat(name.strip("/")[3:])
+    except ValueError:
+        return None
+    if (since is None or day >= since) and (until is None or day <= until):
+        return day
+    return None
+
+
+def partitions(platform: str, since: date | None = None, until: date | None = None) -> list[tuple[date, Path]]:
+    base = root() / platform
+    if not base.is_dir():
+        return []
+    found = []
+    for path in base.glob("dt=*"):
+        day = partition_day(path.name, since, until)
+        if day is not None:
+            found.append((day, path))
+    return sorted(found)
+
+
+def read_part(part: Path):
+    """Records of one part file, in the order they were appended; stops at a damaged member."""
+    try:
+        with gzip.open(part, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+    except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+        logging.warning(f"Stopped reading {part} at a damaged record: {e}")
+
+
+def entries(platform: str, since: date | None = None, until: date | None = None):
+    """Yield (handle, payload, landed_at) oldest first, streaming the part files of each day."""
+    for _, path in partitions(platform, since, until):
+        parts = [read_part(part) for part in sorted(path.glob("*.ndjson.gz"))]
+        for entry in heapq.merge(*parts, key=lambda entry: entry["landed_at"]):
+            yield entry["handle"], entry["payload"], datetime.fromisoformat(entry["landed_at"])
+
+
+# ============================== Remote =====================================
+def _s3(*args: str) -> str:
+    """Run one `aws s3` command (the AWS CLI ships on the GitHub runners); raises on failure."""
+    return subprocess.run(["aws", "s3", *args], check=True, capture_output=True, text=True).stdout
+
+
+def remote_partitions(platform: str, since: date | None = None, until: date | None = None) -> list[tuple[date, str]]:
+    try:
+        listing = _s3("ls", f"{remote()}/{platform}/")
+    except subprocess.CalledProcessError as e:
+        # `aws s3 ls` exits 1 when the prefix does not exist yet
+        if e.returncode == 1 and not e.stderr.strip():
+            return []
+        raise
+    found = []
+    for line in listing.splitlines():
+        name = line.split()[-1] if line.strip().startswith("PRE ") else ""
+        day = partition_day(name, since, until)
+        if day is not None:
+            found.append((day, f"{remote()}/{platform}/{name.strip('/')}"))
+    return sorted(found)
+
+
+def push() -> bool:
+    """Upload the local zone to LANDING_REMOTE; run at the end of every CI job that lands payloads."""
+    if not remote() or not root().is_dir():
+        return True
+    try:
+        _s3("sync", str(root()), remote(), "--only-show-errors", "--exclude", "*", "--include", "*.ndjson.gz")
+    except (OSError, subprocess.CalledProcessError) as e:
+        logging.error(f"Could not push the landing zone to {remote()}: {getattr(e, 'stderr', '') or e}")
+        return False
+    logging.info(f"Pushed the landing zone to {remote()}.")
+    return True
+
+
+def pull(platform: str, since: date | None = None, until: date | None = None) -> int:
+    """Download a platform's remote partitions in [since, until] into the local zone."""
+    pulled = remote_partitions(platform, since, until)
+    for day, url in pulled:
+        _s3("sync", url, str(partition(platform, day)), "--only-show-errors")
+    logging.info(f"Pulled {len(pulled)} {platform} landing partitions from {remote()}.")
+    return len(pulled)
+
+
+# ============================== Replay / prune =====================================
+def replay(platform: str, since: date | None = None, until: date | None = None, chunk: int = REPLAY_CHUNK) -> int:
+    """
+    Rebuild a platform's tables from landed payloads, oldest first.
+
+    Metric snapshots are not re-recorded; everything else the ETL writes
+    (tables, profiles, mentions) is. Returns the number of payloads replayed.
+    """
+    if remote():
+        pull(platform, since, until)
+    module = importlib.import_module(MODULES[platform])
+    counter = itertools.count()
+    # Chunks are consumed lazily by to_batches, so raw payloads are never all in memory
+    stream = (entry for entry, _ in zip(entries(platform, since, until), counter))
+    for first in stream:
+        module.store(module.to_batches(itertools.chain([first], itertools.islice(stream, chunk - 1))), snapshot=False)
+    replayed = next(counter)
+    logging.info(f"Replayed {replayed} landed {platform} payloads.")
+    return replayed
+
+
+def prune(days: int | None = None) -> int:
+    """Delete partitions older than `days` (LANDING_RETENTION_DAYS) for every platform, locally and remotely."""
+    cutoff = date.today() - timedelta(days=retention_days() if days is None else days)
+    removed = 0
+    for platform in MODULES:
+        for day, path in partitions(platform, until=cutoff - timedelta(days=1)):
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        if not remote():
+            continue
+        try:
+            for day, url in remote_partitions(platform, until=cutoff - timedelta(days=1)):
+                _s3("rm", f"{url}/", "--recursive", "--only-show-errors")
+                removed += 1
+        except (OSError, subprocess.CalledProcessError) as e:
+            logging.error(f"Could not prune remote {platform} landing partitions: {getattr(e, 'stderr', '') or e}")
+    if removed:
+        logging.info(f"Pruned {removed} landing partitions older than {cutoff}.")
+    return removed
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
+    parser = argparse.ArgumentParser(description="Landing zone maintenance")
+    parser.add_argument("command", choices=["replay", "prune", "push"])
+    parser.add_argument("platforms", nargs="*")
+    parser.add_argument("--since", type=date.fromisoformat)
+    parser.add_argument("--until", type=date.fromisoformat)
+    parser.add_argument("--days", type=int, help="retention for prune")
+    args = parser.parse_args()
+    try:
+        if args.command == "push" and not push():
+            raise SystemExit(1)
+        if args.command == "prune":
+            prune(args.days)
+        for platform in (args.platforms or list(MODULES)) if args.command == "replay" else []:
+            replay(platform, args.since, args.until)
+    finally:
+        db.close_pool()
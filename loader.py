@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import csv
+import io
+import logging
+from typing import TYPE_CHECKING
+
+import db
+import records
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# ============================== Bulk upsert =====================================
+def csv_buffer(data, columns: list[str]) -> tuple[io.StringIO, str]:
+    """Serialise a DataFrame or Arrow table to CSV plus the COPY options that read it back."""
+    import pandas as pd
+
+    buffer = io.StringIO()
+    if isinstance(data, pd.DataFrame):
+        # convert_dtypes: integer columns holding NaN are float64 and would be written as "1.0",
+        # which COPY rejects for BIGINT/INT; as nullable Int64 they are written as "1"
+        data[columns].convert_dtypes().to_csv(
+            buffer, index=False, header=False, na_rep="\\N", quoting=csv.QUOTE_MINIMAL
+        )
+        options = "FORMAT csv, NULL '\\N'"
+    else:
+        import pyarrow.csv as pacsv
+
+        raw = io.BytesIO()
+        # Valid values are always quoted, so an unquoted empty field can only be NULL
+        pacsv.write_csv(
+            data.select(columns), raw, pacsv.WriteOptions(include_header=False, quoting_style="all_valid")
+        )
+        buffer.write(raw.getvalue().decode("utf-8"))
+        options = "FORMAT csv"
+    buffer.seek(0)
+    return buffer, options
+
+
+def bulk_upsert(
+    cur,
+    table: str,
+    data,
+    key: list[str],
+    columns: list[str] | None = None,
+    hash_exclude: list[str] | None = None,
+) -> dict:
+    """
+    Upsert a DataFrame, Arrow table or records.Batch into `table` with one COPY and one merge.
+
+    Rows are streamed with COPY FROM STDIN into a temp staging table shaped
+    like `table`, deduplicated on `key` (the last row for a key wins) and
+    merged with a single INSERT ... SELECT ... ON CONFLICT (key) DO UPDATE.
+    Each row carries an md5 `row_hash` of its columns (minus `hash_exclude`,
+    e.g. load timestamps); existing rows whose hash is unchanged are not
+    touched, so they cost no WAL or dead tuples.
+    Returns the inserted / updated / unchanged row counts.
+    """
+    import pandas as pd
+
+    if isinstance(data, records.Batch):
+        data = data.to_arrow()
+    columns = columns or list(data.columns if isinstance(data, pd.DataFrame) else data.column_names)
+    if isinstance(data, pd.DataFrame):
+        data = data.drop_duplicates(subset=key, keep="last")
+    if len(data) == 0:
+        return {"inserted": 0, "updated": 0, "unchanged": 0}
+
+    stage = f"_stage_{table}"
+    col_list = ", ".join(columns)
+    key_list = ", ".join(key)
+    hashed = ", ".join(c for c in columns if c not in (hash_exclude or []))
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns + ["row_hash"] if c not in key)
+
+    cur.execute(f"DROP TABLE IF EXISTS {stage}")
+    cur.execute(f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+    buffer, options = csv_buffer(data, columns)
+    cur.copy_expert(f"COPY {stage} ({col_list}) FROM STDIN WITH ({options})", buffer)
+    cur.execute(f"""
+        WITH incoming AS (
+            SELECT DISTINCT ON ({key_list}) {col_list}, md5(ROW({hashed})::text) AS row_hash
+            FROM {stage}
+            ORDER BY {key_list}, ctid DESC
+        ), merged AS (
+            INSERT INTO {table} AS t ({col_list}, row_hash)
+            SELECT {col_list}, row_hash FROM incoming
+            ON CONFLICT ({key_list}) DO UPDATE SET {updates}
+            WHERE t.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT
+            (SELECT count(*) FROM incoming),
+            count(*) FILTER (WHERE inserted),
+            count(*) FILTER (WHERE NOT inserted)
+        FROM merged
+    """)
+    staged, inserted, updated = cur.fetchone()
+    stats = {"inserted": inserted, "updated": updated, "unchanged": staged - inserted - updated}
+    logging.info(
+        f"{table}: {stats['inserted']} inserted, {stats['updated']} updated, {stats['unchanged']} unchanged."
+    )
+    return stats
+
+
+def fetch_frame(cur, query: str, dtype=None, params=None) -> pd.DataFrame:
+    """Read a query result with COPY TO STDOUT, much faster than row-wise fetches for large scans."""
+    import pandas as pd
+
+    if params:
+        # COPY takes no bind parameters; bind them client-side
+        query = cur.mogrify(query, params).decode()
+    buffer = io.StringIO()
+    cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", buffer)
+    buffer.seek(0)
+    return pd.read_csv(buffer, dtype=dtype)
+
+
+def load_tables(batches: list[tuple]) -> dict:
+    """
+    Load several (table, data, key[, hash_exclude]) batches in one transaction, in order.
+
+    Parent tables must come before the tables that reference them. Returns
+    the per-table inserted / updated / unchanged counts.
+    """
+    with db.connection() as conn, conn.cursor() as cur:
+        return {batch[0]: bulk_upsert(cur, *batch[:3], hash_exclude=batch[3] if len(batch) > 3 else None)
+                for batch in batches}
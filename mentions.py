@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+import db
+import loader
+from profiles import norm
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# The mention_edges and mention_candidates tables are created with the rest of the schema in db.py.
+
+# @handle as used on Instagram / X / TikTok: letters, digits, "_" and inner dots; not part of an e-mail
+MENTION = re.compile(r"(?<![\w.@])@([A-Za-z0-9_](?:[A-Za-z0-9_.]{0,28}[A-Za-z0-9_])?)")
+
+# Handles we already track, on any platform; candidates must not be in here
+KNOWN_HANDLES_SQL = " UNION ".join(
+    f"SELECT {norm(column)} AS handle FROM {table} WHERE {column} IS NOT NULL"
+    for table, column in (
+        ("username_search", "instagram_username"), ("username_search", "youtube_username"),
+        ("username_search", "tiktok_username"), ("username_search", "x_username"),
+        ("insta_user_data", "username"), ("youtube_user_data", "username"),
+        ("tiktok_user_data", "username"), ("influencer_x", "username"),
+    )
+)
+
+
+# ============================== Extract =====================================
+def extract(df: pd.DataFrame, platform: str, source_col: str, texts: dict[str, str | None]) -> pd.DataFrame:
+    """
+    Mention edges from raw (uncleaned) text columns.
+
+    `texts` maps each text column to the column holding its post id, or None for
+    profile text such as bios (the column name is used as the post id then).
+    Must run before the ETL strips "@handle" tokens from the text.
+    """
+    import pandas as pd
+
+    frames = []
+    for text_col, post_col in texts.items():
+        if text_col not in df.columns:
+            continue
+        edges = pd.DataFrame({
+            "source_handle": df[source_col].astype(str).str.strip("@ ").str.lower(),
+            "post_id": df[post_col].astype(str) if post_col else text_col,
+            "target_handle": df[text_col].fillna("").astype(str).str.findall(MENTION),
+        }).explode("target_handle").dropna(subset=["target_handle"])
+        frames.append(edges)
+    if not frames:
+        return pd.DataFrame(columns=["platform", "source_handle", "target_handle", "post_id", "seen_at"])
+    edges = pd.concat(frames, ignore_index=True)
+    edges["target_handle"] = edges["target_handle"].str.rstrip(".").str.lower()
+    edges = edges[edges["target_handle"] != edges["source_handle"]].drop_duplicates()
+    edges["platform"] = platform
+    edges["seen_at"] = datetime.now(timezone.utc).isoformat()
+    return edges[["platform", "source_handle", "target_handle", "post_id", "seen_at"]]
+
+
+def record(edges: pd.DataFrame) -> int:
+    """Upsert mention edges; seen_at is not part of the change hash, so re-seen edges are no-ops."""
+    if edges is None or edges.empty:
+        return 0
+    try:
+        loader.load_tables([
+            ("mention_edges", edges, ["platform", "source_handle", "target_handle", "post_id"], ["seen_at"]),
+        ])
+        return len(edges)
+    except Exception as e:
+        logging.error(f"Error recording mention edges: {e}")
+        return 0
+
+
+# ============================== Rank =====================================
+def pagerank(edges: pd.DataFrame, damping: float = 0.85, iterations: int = 50, tol: float = 1e-9) -> pd.Series:
+    """Weighted PageRank over (source_handle, target_handle, weight) edges, vectorised with numpy."""
+    import numpy as np
+    import pandas as pd
+
+    nodes, index = np.unique(np.concatenate([edges["source_handle"], edges["target_handle"]]), return_inverse=True)
+    src, dst = index[: len(edges)], index[len(edges):]
+    weight = edges["weight"].to_numpy(dtype=float)
+    n = len(nodes)
+    out_weight = np.bincount(src, weights=weight, minlength=n)
+    share = weight / out_weight[src]
+    dangling = out_weight == 0
+    rank = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        new = np.bincount(dst, weights=rank[src] * share, minlength=n)
+        new = (1 - damping) / n + damping * (new + rank[dangling].sum() / n)
+        done = np.abs(new - rank).sum() < tol
+        rank = new
+        if done:
+            break
+    return pd.Series(rank, index=nodes).sort_values(ascending=False)
+
+
+REJECTED_SQL = """
+    SELECT handle FROM mention_candidates
+    WHERE rejected_at >= now() - make_interval(days => %(recheck_days)s)
+      AND (%(platform)s::text IS NULL OR platform = %(platform)s)
+"""
+
+
+def candidates(limit: int = 50, min_sources: int = 2, days: int = 180, platform: str | None = None,
+               recheck_days: int = 90) -> list[str]:
+    """
+    Highest-ranked mentioned handles we do not track yet.
+
+    Edge weight is the number of distinct posts in which one account mentions
+    another; `min_sources` drops handles mentioned by a single account only.
+    With `platform`, only mentions made on that platform are ranked, so the
+    handles are (unverified) accounts of that platform. Handles rejected by
+    verification (see `reject`) are left out for `recheck_days`.
+    """
+    query = f"""
+        SELECT source_handle, target_handle, count(DISTINCT post_id) AS weight
+        FROM mention_edges
+        WHERE seen_at >= now() - make_interval(days => {int(days)})
+          AND (%(platform)s::text IS NULL OR platform = %(platform)s)
+        GROUP BY source_handle, target_handle
+    """
+    try:
+        with db.connection() as conn, conn.cursor() as cur:
+            edges = loader.fetch_frame(
+                cur, query, dtype={"source_handle": str, "target_handle": str}, params={"platform": platform}
+            )
+            known = set(loader.fetch_frame(cur, KNOWN_HANDLES_SQL, dtype=str)["handle"].dropna())
+            cur.execute(REJECTED_SQL, {"platform": platform, "recheck_days": recheck_days})
+            known.update(handle for handle, in cur.fetchall())
+    except Exception as e:
+        logging.error(f"Error reading mention graph: {e}")
+        return []
+    if edges.empty:
+        return []
+
+    ranks = pagerank(edges)
+    sources = edges.groupby("target_handle")["source_handle"].nunique()
+    eligible = sources[sources >= min_sources].index.difference(list(known))
+    picked = ranks[ranks.index.isin(eligible)].head(limit)
+    logging.info(f"Mention graph: {len(edges)} edges, {len(eligible)} unseen handles, proposing {len(picked)}.")
+    return picked.index.tolist()
+
+
+def reject(platform: str, rejected: dict[str, str]) -> int:
+    """Remember candidates that failed verification (handle -> reason), so `candidates` skips them."""
+    if not rejected:
+        return 0
+    try:
+        with db.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO mention_candidates AS c (platform, handle, rejected_at, reason)
+                SELECT %(platform)s, h.handle, now(), h.reason
+                FROM unnest(%(handles)s::text[], %(reasons)s::text[]) AS h(handle, reason)
+                ON CONFLICT (platform, handle) DO UPDATE SET rejected_at = EXCLUDED.rejected_at, reason = EXCLUDED.reason
+            """, {"platform": platform, "handles": list(rejected), "reasons": list(rejected.values())})
+        return len(rejected)
+    except Exception as e:
+        logging.error(f"Error recording rejected {platform} mention candidates: {e}")
+        return 0
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
+    parser = argparse.ArgumentParser(description="Discovery candidates from the mention graph")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--min-sources", type=int, default=2)
+    parser.add_argument("--platform", choices=["instagram", "youtube", "tiktok", "x"])
+    args = parser.parse_args()
+    try:
+        print("\n".join(candidates(args.limit, args.min_sources, platform=args.platform)))
+    finally:
+        db.close_pool()
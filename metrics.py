@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import argparse
+import logging
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+import db
+import loader
+import transform
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# ============================== Source queries =====================================
+# Every platform is mapped onto the same long post shape; accounts without posts
+# in the window keep one row with NULL post columns (LEFT JOIN).
+POSTS_QUERIES = {
+    "instagram": """
+        SELECT u.user_id AS account, u.username AS handle, u.follower_count AS followers,
+               p.post_id, p.timestamp AS posted_at, p.like_count AS likes,
+               p.comments_count AS comments, NULL::bigint AS shares, NULL::bigint AS views
+        FROM insta_user_data u
+        LEFT JOIN insta_post_data p
+          ON p.user_id = u.user_id AND p.timestamp >= now() - make_interval(days => {days})
+    """,
+    "youtube": """
+        SELECT u.channel_id AS account, u.username AS handle, u.subscriber_count AS followers,
+               p.video_id AS post_id, p.video_published_at AS posted_at, p.video_likes AS likes,
+               p.video_comments AS comments, NULL::bigint AS shares, p.video_views AS views
+        FROM youtube_user_data u
+        LEFT JOIN youtube_post_data p
+          ON p.channel_id = u.channel_id AND p.video_published_at >= now() - make_interval(days => {days})
+    """,
+    # The TikTok scrape has no post timestamps, so every stored video counts
+    "tiktok": """
+        SELECT u.username AS account, u.username AS handle, u.followers,
+               p.video_id AS post_id, NULL::timestamp AS posted_at, NULL::bigint AS likes,
+               NULL::bigint AS comments, NULL::bigint AS shares, p.video_views AS views
+        FROM tiktok_user_data u
+        LEFT JOIN tiktok_post_data p ON p.username = u.username
+    """,
+    "x": """
+        SELECT id AS account, username AS handle, followers,
+               CASE WHEN published_at >= now() - make_interval(days => {days}) THEN id END AS post_id,
+               CASE WHEN published_at >= now() - make_interval(days => {days}) THEN published_at END AS posted_at,
+               likes, comments_count AS comments, retweets AS shares, NULL::bigint AS views
+        FROM influencer_x
+    """,
+}
+
+GROWTH_QUERY = """
+    SELECT account,
+           (array_agg(value ORDER BY ts DESC))[1]
+             - (array_agg(value ORDER BY ts) FILTER (WHERE ts >= now() - interval '7 days'))[1] AS followers_delta_7d,
+           (array_agg(value ORDER BY ts DESC))[1] - (array_agg(value ORDER BY ts))[1] AS followers_delta_30d
+    FROM metric_snapshots
+    WHERE platform = '{platform}' AND metric = 'followers' AND ts >= now() - interval '30 days'
+    GROUP BY account
+"""
+
+# One vectorized pass over the long post frame for all KPIs
+KPI_QUERY = """
+    SELECT
+        '{platform}' AS platform,
+        p.account,
+        any_value(p.handle) AS handle,
+        max(p.followers)::BIGINT AS followers,
+        count(p.post_id)::INTEGER AS posts,
+        CASE WHEN count(p.posted_at) > 0 THEN count(p.posted_at) / ({days} / 7.0) END AS posts_per_week,
+        avg(p.likes) AS avg_likes,
+        avg(p.comments) AS avg_comments,
+        median(p.views) AS median_views,
+        avg((coalesce(p.likes, 0) + coalesce(p.comments, 0) + coalesce(p.shares, 0)) / nullif(p.followers, 0))
+            FILTER (WHERE p.post_id IS NOT NULL AND (p.likes IS NOT NULL OR p.comments IS NOT NULL)) AS engagement_rate,
+        avg(p.likes) / nullif(max(p.followers), 0) AS likes_per_follower,
+        median(p.views) / nullif(max(p.followers), 0) AS views_per_follower,
+        any_value(g.followers_delta_7d)::BIGINT AS followers_delta_7d,
+        any_value(g.followers_delta_30d)::BIGINT AS followers_delta_30d
+    FROM posts p
+    LEFT JOIN growth g ON g.account = p.account
+    GROUP BY p.account
+"""
+
+INT_COLUMNS = ["followers", "posts", "followers_delta_7d", "followers_delta_30d"]
+
+
+# ============================== Stage =====================================
+def compute(platform: str, days: int = 90) -> pd.DataFrame:
+    """Per-account KPIs for one platform over the last `days`."""
+    with db.connection() as conn, conn.cursor() as cur:
+        posts = loader.fetch_frame(cur, POSTS_QUERIES[platform].format(days=int(days)))
+        growth = loader.fetch_frame(cur, GROWTH_QUERY.format(platform=platform))
+    if posts.empty:
+        return posts
+    # read_csv infers numeric ids; keep both join sides as text like the source tables
+    posts["account"] = posts["account"].astype(str)
+    growth["account"] = growth["account"].astype(str)
+
+    duck = transform.get_duck().cursor()
+    duck.register("posts", posts)
+    duck.register("growth", growth)
+    kpis = duck.execute(KPI_QUERY.format(platform=platform, days=int(days))).fetchdf()
+    duck.close()
+
+    for column in INT_COLUMNS:
+        kpis[column] = kpis[column].astype("Int64")
+    kpis["computed_at"] = datetime.now(timezone.utc).isoformat()
+    return kpis
+
+
+def refresh(platform: str, days: int = 90) -> dict:
+    """Recompute and store the summary rows for one platform; run after each ETL."""
+    try:
+        kpis = compute(platform, days)
+        if kpis.empty:
+            logging.info(f"No {platform} accounts to summarise.")
+            return {}
+        stats = loader.load_tables([("influencer_metrics", kpis, ["platform", "account"], ["computed_at"])])
+        logging.info(f"Refreshed {len(kpis)} {platform} rows in influencer_metrics.")
+        return stats
+    except Exception as e:
+        logging.error(f"Error refreshing {platform} metrics: {e}")
+        return {}
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
+    parser = argparse.ArgumentParser(description="Recompute influencer_metrics")
+    parser.add_argument("platforms", nargs="*", default=list(POSTS_QUERIES))
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+    try:
+        for name in args.platforms:
+            refresh(name, args.days)
+    finally:
+        db.close_pool()
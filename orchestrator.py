@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import logging
+import time
+
+import pandas as pd
+
+import browsers
+import db
+import landing
+import metrics
+import scheduler
+import transform
+from profiles import norm
+from workqueue import SEARCH_COLUMNS
+
+
+# ============================== Stages =====================================
+# stage -> stages it waits for. Dependencies only order the stages: a failed
+# discovery run still leaves usable rows in username_search for the ETLs.
+GRAPH = {
+    "search": [],
+    "instagram": ["search"],
+    "youtube": ["search"],
+    "x": ["search"],
+    "tiktok": ["search"],
+}
+
+
+def read_usernames() -> dict[str, list[str]]:
+    """One read of username_search for every platform stage."""
+    columns = ", ".join(f"{norm(column)} AS {platform}" for platform, column in SEARCH_COLUMNS.items())
+    with db.connection() as conn:
+        names = pd.read_sql(f"SELECT {columns} FROM username_search", conn)
+    return {platform: names[platform].dropna().unique().tolist() for platform in SEARCH_COLUMNS}
+
+
+class Pipeline:
+    """
+    Runs the discovery and ETL stages as a dependency graph in one process.
+
+    Everything shares the process-wide DB pool, HTTP sessions and browser pool.
+    The API-bound ETLs (instagram, youtube, x) run in worker threads, so they
+    overlap with the browser-bound stages (search, tiktok) on the event loop.
+    """
+
+    def __init__(self, stages: list[str]):
+        self.stages = stages
+        self.results: dict[str, str] = {}
+        self._usernames: dict[str, list[str]] | None = None
+        self._usernames_lock = asyncio.Lock()
+
+    async def usernames(self, platform: str) -> list[str]:
+        async with self._usernames_lock:
+            if self._usernames is None:
+                self._usernames = await asyncio.to_thread(read_usernames)
+        return await asyncio.to_thread(scheduler.plan, platform, self._usernames[platform])
+
+    async def run_stage(self, stage: str):
+        if stage == "search":
+            import srh
+
+            await srh.run_search(close_shared=False)
+            return
+        usernames = await self.usernames(stage)
+        logging.info(f"[{stage}] {len(usernames)} accounts to refresh.")
+        if stage == "tiktok":
+            import tik
+
+            await tik.scrape_batch(usernames)
+        elif stage == "instagram":
+            import insta
+
+            await asyncio.to_thread(insta.main, usernames)
+        elif stage == "youtube":
+            import yt
+
+            await asyncio.to_thread(yt.youtube_data, usernames)
+        elif stage == "x":
+            import xuser
+
+            await asyncio.to_thread(xuser.process_batch, usernames)
+        await asyncio.to_thread(metrics.refresh, stage)
+
+    async def run(self) -> dict[str, str]:
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def run_after_deps(stage: str):
+            deps = [tasks[dep] for dep in GRAPH[stage] if dep in tasks]
+            await asyncio.gather(*deps, return_exceptions=True)
+            started = time.monotonic()
+            try:
+                await self.run_stage(stage)
+                self.results[stage] = "ok"
+            except Exception as e:
+                logging.exception(f"[{stage}] failed: {e}")
+                self.results[stage] = f"failed: {e}"
+            logging.info(f"[{stage}] finished in {time.monotonic() - started:.0f}s")
+
+        for stage in GRAPH:
+            if stage in self.stages:
+                tasks[stage] = asyncio.create_task(run_after_deps(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            if "search" in tasks:
+                import srh
+
+                await srh.close_clients()
+            await browsers.close_browser_pool()
+            transform.close_duck()
+            landing.prune()
+            await db.close_async_pool()
+            db.close_pool()
+        return self.results
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Run discovery and all platform ETLs in one process")
+    parser.add_argument("stages", nargs="*", default=list(GRAPH), help=f"subset of {', '.join(GRAPH)}")
+    args = parser.parse_args()
+    unknown = set(args.stages) - set(GRAPH)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    results = asyncio.run(Pipeline(args.stages).run())
+    for stage, outcome in results.items():
+        logging.info(f"{stage}: {outcome}")
+    raise SystemExit(0 if all(outcome == "ok" for outcome in results.values()) else 1)
@@ -0,0 +1,123 @@
+import json
+import logging
+import os
+import threading
+
+import db
+from profiles import normalize_handle
+
+
+# ============================== Config =====================================
+def enabled() -> bool:
+    """COUNTER_PROBE=0 turns the two-phase refresh off: every account gets the full fetch."""
+    return os.getenv("COUNTER_PROBE", "1") != "0"
+
+
+def full_refresh_days() -> float:
+    """Engagement stats on posts go stale even when no post was added; refetch them this often."""
+    return float(os.getenv("PROBE_FULL_REFRESH_DAYS", "7"))
+
+
+LOAD_SQL = """
+    SELECT handle, counters, full_at < now() - make_interval(secs => %(max_age)s) AS stale, post_cursor
+    FROM refresh_state
+    WHERE platform = %(platform)s AND handle = ANY(%(handles)s)
+"""
+
+SAVE_SQL = """
+    INSERT INTO refresh_state AS r (platform, handle, counters, probed_at, full_at, post_cursor)
+    SELECT %(platform)s, h.handle, h.counters::jsonb, now(), CASE WHEN h.full THEN now() END, h.post_cursor::jsonb
+    FROM unnest(%(handles)s::text[], %(counters)s::text[], %(full)s::bool[], %(cursors)s::text[])
+        AS h(handle, counters, full, post_cursor)
+    ON CONFLICT (platform, handle) DO UPDATE SET
+        counters = EXCLUDED.counters,
+        probed_at = EXCLUDED.probed_at,
+        full_at = coalesce(EXCLUDED.full_at, r.full_at),
+        post_cursor = coalesce(EXCLUDED.post_cursor, r.post_cursor)
+"""
+
+
+# ============================== Probe =====================================
+class Probe:
+    """
+    Two-phase refresh state for one platform run.
+
+    The ETLs first fetch an account's cheap counters (post / video / tweet
+    count) and only do the per-post fetch when `needs_full` says so: a counter
+    moved since the last run, the last full fetch is older than
+    PROBE_FULL_REFRESH_DAYS, or the account was never seen.
+
+    It also keeps each account's post cursor (the newest post ID, timestamp or
+    paging cursor already ingested), so changed accounts fetch only newer posts;
+    older posts are revisited by the windowed full refresh when the account is
+    due. What was fetched is queued with `seen` and written in one statement by
+    `save`, after the run's rows are stored.
+    """
+
+    def __init__(self, platform: str, handles):
+        self.platform = platform
+        self.state: dict[str, tuple[dict, bool, dict | None]] = {}
+        self._seen: dict[str, tuple[dict, bool, dict | None]] = {}
+        self._lock = threading.Lock()
+        if enabled():
+            self.load([normalize_handle(h) for h in handles])
+
+    def load(self, handles: list[str]):
+        try:
+            with db.connection() as conn, conn.cursor() as cur:
+                cur.execute(LOAD_SQL, {
+                    "platform": self.platform, "handles": handles, "max_age": full_refresh_days() * 86_400,
+                })
+                self.state = {
+                    handle: (counters or {}, bool(stale), post_cursor)
+                    for handle, counters, stale, post_cursor in cur.fetchall()
+                }
+        except Exception as e:
+            logging.error(f"Error loading {self.platform} refresh state, fetching every account in full: {e}")
+            self.state = {}
+
+    def due(self, handle: str) -> bool:
+        """True when the account gets a full fetch whatever its counters say."""
+        state = self.state.get(normalize_handle(handle))
+        return not enabled() or state is None or state[1]
+
+    def needs_full(self, handle: str, counters: dict) -> bool:
+        state = self.state.get(normalize_handle(handle))
+        return self.due(handle) or any(state[0].get(name) != value for name, value in counters.items())
+
+    def since(self, handle: str) -> dict | None:
+        """The stored post cursor to fetch newer posts from; None when the account is due for a full window."""
+        if self.due(handle):
+            return None
+        return self.state[normalize_handle(handle)][2]
+
+    def seen(self, handle: str, counters: dict, full: bool, post_cursor: dict | None = None):
+        """
+        Queue what one account's fetch saw. `full` restarts the account's
+        refresh window, so pass it only for fetches not limited by a cursor;
+        a None `post_cursor` keeps the stored one.
+        """
+        with self._lock:
+            self._seen[normalize_handle(handle)] = (counters, full, post_cursor)
+
+    def save(self) -> int:
+        """Write the queued counters; call once the run's rows are stored."""
+        with self._lock:
+            seen, self._seen = self._seen, {}
+        if not seen or not enabled():
+            return 0
+        full = sum(full for _, full, _ in seen.values())
+        try:
+            with db.connection() as conn, conn.cursor() as cur:
+                cur.execute(SAVE_SQL, {
+                    "platform": self.platform,
+                    "handles": list(seen),
+                    "counters": [json.dumps(counters) for counters, _, _ in seen.values()],
+                    "full": [full for _, full, _ in seen.values()],
+                    "cursors": [json.dumps(post_cursor) if post_cursor else None for _, _, post_cursor in seen.values()],
+                })
+        except Exception as e:
+            logging.error(f"Error saving {self.platform} refresh state: {e}")
+            return 0
+        logging.info(f"Probe: saved {len(seen)} {self.platform} accounts, {full} of them refreshed in full.")
+        return len(seen)
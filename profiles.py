@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import argparse
+import logging
+from typing import TYPE_CHECKING, Iterable
+
+import db
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# The influencer_profiles table and the handle indexes are created with the rest of the schema in db.py.
+
+def norm(column: str) -> str:
+    """SQL for a normalized handle; must match the expression indexes in db.SCHEMA exactly."""
+    return f"lower(btrim({column}, '@ '))"
+
+
+def normalize_handle(handle) -> str:
+    """Python twin of `norm` for lookups and refresh keys."""
+    return str(handle).strip("@ ").lower()
+
+
+# platform -> (username_search column, platform table, handle column, id column, followers column)
+PLATFORMS = {
+    "instagram": ("instagram_username", "insta_user_data", "username", "user_id", "follower_count"),
+    "youtube": ("youtube_username", "youtube_user_data", "username", "channel_id", "subscriber_count"),
+    "tiktok": ("tiktok_username", "tiktok_user_data", "username", "username", "followers"),
+    "x": ("x_username", "influencer_x", "username", "id", "followers"),
+}
+
+PROFILE_COLUMNS = [
+    column
+    for platform in PLATFORMS
+    for column in (f"{platform}_handle", f"{platform}_account", f"{platform}_followers")
+]
+PROFILE_KEY = "instagram_handle"
+
+
+def _refresh_sql(where: str) -> str:
+    selects, joins = [], []
+    for platform, (search_col, table, handle_col, id_col, followers_col) in PLATFORMS.items():
+        selects.append(f"{norm(f's.{search_col}')}, {platform}.{id_col}, {platform}.{followers_col}")
+        # Lateral lookups hit the expression index on each platform table
+        joins.append(f"""
+            LEFT JOIN LATERAL (
+                SELECT {id_col}, {followers_col} FROM {table}
+                WHERE {norm(handle_col)} = {norm(f's.{search_col}')}
+                LIMIT 1
+            ) {platform} ON true""")
+    followers = " + ".join(f"coalesce({platform}_followers, 0)" for platform in PLATFORMS)
+    updated = [c for c in PROFILE_COLUMNS if c != PROFILE_KEY]
+    # Keyed by the person's normalized Instagram handle (discovery starts from it), not by
+    # username_search.id, which restarts at 1 whenever srh.py recreates the table.
+    # A handle found twice takes its newest username_search row.
+    return f"""
+        INSERT INTO influencer_profiles AS p ({', '.join(PROFILE_COLUMNS)}, total_followers, refreshed_at)
+        SELECT DISTINCT ON ({PROFILE_KEY}) {', '.join(PROFILE_COLUMNS)}, {followers}, now()
+        FROM (
+            SELECT s.id, {', '.join(selects)}
+            FROM username_search s {''.join(joins)}
+            WHERE {where}
+        ) AS src ({', '.join(['id', *PROFILE_COLUMNS])})
+        WHERE {PROFILE_KEY} <> ''
+        ORDER BY {PROFILE_KEY}, id DESC
+        ON CONFLICT ({PROFILE_KEY}) DO UPDATE SET
+            {', '.join(f'{c} = EXCLUDED.{c}' for c in updated)},
+            total_followers = EXCLUDED.total_followers,
+            refreshed_at = EXCLUDED.refreshed_at
+        WHERE ({', '.join(f'p.{c}' for c in updated)})
+              IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in updated)})
+    """
+
+
+# Profiles of people no longer in username_search; only run by `rebuild`
+PRUNE_SQL = f"""
+    DELETE FROM influencer_profiles p
+    WHERE NOT EXISTS (
+        SELECT 1 FROM username_search s WHERE {norm('s.instagram_username')} = p.{PROFILE_KEY}
+    )
+"""
+
+
+# ============================== Refresh =====================================
+def refresh(platform: str, handles: Iterable) -> int:
+    """
+    Rebuild the profile rows whose `platform` handle was touched by the latest ETL run.
+
+    Only username_search rows matching `handles` are recomputed, and rows whose
+    values did not change are left alone. Returns the number of rows written.
+    """
+    import pandas as pd
+
+    handles = sorted({normalize_handle(h) for h in handles if h is not None and not pd.isna(h)})
+    if not handles:
+        return 0
+    search_col = PLATFORMS[platform][0]
+    try:
+        with db.connection() as conn, conn.cursor() as cur:
+            cur.execute(_refresh_sql(f"{norm(f's.{search_col}')} = ANY(%(handles)s)"), {"handles": handles})
+            written = cur.rowcount
+        logging.info(f"Refreshed {written} influencer profiles for {len(handles)} {platform} handles.")
+        return written
+    except Exception as e:
+        logging.error(f"Error refreshing {platform} profiles: {e}")
+        return 0
+
+
+def rebuild() -> int:
+    """Recompute every profile and drop people no longer searched, e.g. after a backfill or a new srh.py run."""
+    with db.connection() as conn, conn.cursor() as cur:
+        cur.execute(PRUNE_SQL)
+        cur.execute(_refresh_sql("true"))
+        written = cur.rowcount
+    logging.info(f"Rebuilt {written} influencer profiles.")
+    return written
+
+
+# ============================== Lookup =====================================
+def find(handle: str) -> pd.DataFrame:
+    """Every platform for the person with `handle` on any platform (one index probe per column)."""
+    import pandas as pd
+
+    handle = normalize_handle(handle)
+    where = " OR ".join(f"{platform}_handle = %(handle)s" for platform in PLATFORMS)
+    with db.connection() as conn:
+        return pd.read_sql(f"SELECT * FROM influencer_profiles WHERE {where}", conn, params={"handle": handle})
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
+    parser = argparse.ArgumentParser(description="Cross-platform influencer profiles")
+    parser.add_argument("command", choices=["rebuild", "find"])
+    parser.add_argument("handle", nargs="?")
+    args = parser.parse_args()
+    try:
+        if args.command == "rebuild":
+            rebuild()
+        else:
+            print(find(args.handle).to_string(index=False))
+    finally:
+        db.close_pool()
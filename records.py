@@ -0,0 +1,142 @@
+from dataclasses import dataclass, fields
+from datetime import datetime
+
+
+# ============================== Records =====================================
+# One slots dataclass per target table; field names are the table's columns.
+# Profiles and posts are separate entities, so account fields are stored once
+# per account instead of once per post.
+@dataclass(slots=True)
+class InstagramProfile:
+    user_id: str
+    username: str
+    name: str | None
+    profile_url: str
+    follower_count: int | None
+    bio: str | None
+    media_count: int | None
+    profile_picture_url: str | None
+
+
+@dataclass(slots=True)
+class InstagramPost:
+    post_id: str
+    post_caption: str | None
+    like_count: int | None
+    comments_count: int | None
+    timestamp: str
+    post_media_url: str | None
+    post_permalink: str | None
+    user_id: str
+
+
+@dataclass(slots=True)
+class YoutubeChannel:
+    channel_id: str
+    username: str
+    channel_title: str
+    channel_description: str
+    subscriber_count: int
+    total_view_count: int
+    total_video_count: int
+    uploads_playlist_id: str
+    channel_created_at: str | None
+    profile_url: str
+    thumbnail_url: str
+
+
+@dataclass(slots=True)
+class YoutubeVideo:
+    channel_id: str
+    video_id: str
+    video_title: str
+    video_description: str
+    video_published_at: str
+    video_url: str
+    video_views: int = 0
+    video_likes: int = 0
+    video_comments: int = 0
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+
+@dataclass(slots=True)
+class TiktokProfile:
+    username: str
+    profile_url: str
+    followers: int
+    total_likes: int
+    bio: str
+
+
+@dataclass(slots=True)
+class TiktokVideo:
+    username: str
+    video_id: str
+    video_url: str
+    video_views: int
+
+
+@dataclass(slots=True)
+class XAccount:
+    """influencer_x keeps one row per account: the profile plus its latest tweet."""
+    created_at: str
+    username: str
+    id: int
+    bio: str | None
+    location: str | None
+    profile_image_url: str | None
+    followers: int
+    is_verified: bool | None
+    published_at: str | None = None
+    text: str | None = None
+    likes: int | None = None
+    retweets: int | None = None
+    comments_count: int | None = None
+
+
+@dataclass(slots=True)
+class XTweet:
+    """Every fetched tweet; not a table of its own, only read for mentions (keyed by tweet_id)."""
+    username: str
+    tweet_id: str
+    text: str
+
+
+# ============================== Batches =====================================
+class Batch:
+    """
+    Column-oriented buffer of one record type.
+
+    Appended records are unpacked into one list per field and not kept, so a
+    batch holds one small object per value instead of a dict per row. Both
+    transform.run and loader.bulk_upsert take a Batch as-is.
+    """
+
+    __slots__ = ("record_type", "columns")
+
+    def __init__(self, record_type):
+        self.record_type = record_type
+        self.columns: dict[str, list] = {field.name: [] for field in fields(record_type)}
+
+    def append(self, record):
+        for name, values in self.columns.items():
+            values.append(getattr(record, name))
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values())))
+
+    def to_arrow(self):
+        import pyarrow as pa
+
+        return pa.Table.from_pydict(self.columns)
+
+    def frame(self, *columns: str):
+        """A pandas frame of just `columns` (all when omitted)."""
+        import pandas as pd
+
+        return pd.DataFrame({name: self.columns[name] for name in columns or self.columns})
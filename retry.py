@@ -0,0 +1,161 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+
+# ============================== Signals =====================================
+class RetryLater(Exception):
+    """
+    Raised by a fetcher instead of sleeping: the work item is parked and
+    retried after a backoff (at least `retry_after` seconds when the API said so).
+    """
+
+    def __init__(self, reason: str, retry_after: float | None = None):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class CircuitOpen(RetryLater):
+    """The endpoint's breaker is open; parking for this does not use up an attempt."""
+
+
+# ============================== Circuit breakers =====================================
+class CircuitBreaker:
+    """
+    Per-endpoint breaker.
+
+    Opens when at least `threshold` of the last `window` calls failed (with
+    `min_calls` seen), or as soon as the API gives an explicit retry-after.
+    While open, calls raise CircuitOpen. After the cooldown one probe call is
+    let through; if it fails the breaker re-opens with twice the cooldown.
+    `max_cooldown` stays within DeferredQueue's default `max_delay`, so only an
+    explicit API wait (e.g. a daily quota) makes the queue give up on items.
+    """
+
+    def __init__(self, name: str, threshold: float = 0.5, window: int = 10, min_calls: int = 4,
+                 cooldown: float = 60, max_cooldown: float = 900):
+        self.name = name
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self._results: deque[bool] = deque(maxlen=window)
+        self._open_until = 0.0
+        self._probing = 0.0  # start time of the half-open probe
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            remaining = self._open_until - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpen(f"{self.name} circuit open", retry_after=remaining)
+            if self._open_until:
+                # One probe at a time; a probe that never reported back stops blocking after a cooldown
+                if self._probing and time.monotonic() - self._probing < self.cooldown:
+                    raise CircuitOpen(f"{self.name} circuit half-open, probe in flight", retry_after=self.cooldown / 4)
+                self._probing = time.monotonic()
+
+    def success(self):
+        with self._lock:
+            self._results.append(True)
+            if self._open_until:
+                logging.info(f"[{self.name}] circuit closed.")
+            self._open_until, self._probing, self.cooldown = 0.0, 0.0, self.base_cooldown
+
+    def failure(self, retry_after: float | None = None):
+        with self._lock:
+            self._results.append(False)
+            failures = self._results.count(False)
+            if self._probing:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            elif retry_after is None and (
+                len(self._results) < self.min_calls or failures / len(self._results) < self.threshold
+            ):
+                return
+            wait = max(self.cooldown, retry_after or 0)
+            self._open_until, self._probing = time.monotonic() + wait, 0.0
+            self._results.clear()
+            logging.warning(f"[{self.name}] circuit open for {wait:.0f}s.")
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for one endpoint, created on first use."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+# ============================== Deferred queue =====================================
+class DeferredQueue:
+    """
+    Works through items, parking the ones whose work raised RetryLater.
+
+    Parked items wait on a heap with jittered exponential backoff while the
+    rest keep going; the queue only sleeps when every remaining item is
+    parked. Items are given up after `max_attempts`, or straight away when
+    the wait asked for exceeds `max_delay` (e.g. a daily quota); they end up
+    in `failed`, as do items whose work raised any other exception.
+    """
+
+    def __init__(self, name: str, max_attempts: int = 4, base_delay: float = 30, max_delay: float = 900):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failed: list[tuple] = []
+
+    def delay(self, attempt: int, retry_after: float | None) -> float:
+        backoff = min(self.max_delay, self.base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+        return max(backoff, retry_after + random.uniform(0, 5)) if retry_after else backoff
+
+    def run(self, items, work):
+        """Yield (item, result) for every item whose `work(item)` returned."""
+        ready = deque(items)
+        parked: list[tuple] = []
+        attempts: dict = {}
+        order = itertools.count()
+        while ready or parked:
+            now = time.monotonic()
+            while parked and parked[0][0] <= now:
+                ready.append(heapq.heappop(parked)[2])
+            if not ready:
+                wait = parked[0][0] - now
+                logging.info(f"[{self.name}] {len(parked)} items parked; next retry in {wait:.0f}s.")
+                time.sleep(wait)
+                continue
+
+            item = ready.popleft()
+            try:
+                result = work(item)
+            except RetryLater as e:
+                if not isinstance(e, CircuitOpen):
+                    attempts[item] = attempts.get(item, 0) + 1
+                attempt = attempts.get(item, 0)
+                if attempt >= self.max_attempts or (e.retry_after or 0) > self.max_delay:
+                    logging.warning(f"[{self.name}] giving up on {item} after {attempt} attempts: {e}")
+                    self.failed.append((item, str(e)))
+                    continue
+                wait = self.delay(max(attempt, 1), e.retry_after)
+                heapq.heappush(parked, (time.monotonic() + wait, next(order), item))
+                logging.info(f"[{self.name}] parked {item} for {wait:.0f}s: {e}")
+                continue
+            except Exception as e:
+                # One bad payload must not end the run for every other item
+                logging.exception(f"[{self.name}] {item} failed: {e}")
+                self.failed.append((item, f"{type(e).__name__}: {e}"))
+                continue
+            yield item, result
+
+        if self.failed:
+            logging.warning(f"[{self.name}] {len(self.failed)} items failed: "
+                            + ", ".join(str(item) for item, _ in self.failed))
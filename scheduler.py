@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import logging
+import math
+import os
+from typing import TYPE_CHECKING
+
+import db
+from profiles import normalize_handle
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# ============================== Budgets =====================================
+# Per-account cost of one refresh: API quota units and wall-clock seconds (including the ETL's sleeps)
+REFRESH_COST = {
+    "instagram": {"units": 1, "seconds": 5},    # one business_discovery call + 2-4s pause
+    "youtube": {"units": 3, "seconds": 2},      # channels + playlistItems + videos
+    "tiktok": {"units": 0, "seconds": 25},      # one browser page + 10-20s of pauses
+    "x": {"units": 2, "seconds": 2},            # users/by/username + the user's tweets
+}
+
+# Staleness stops adding priority after this many days
+MAX_AGE_DAYS = 30
+
+
+def _env_number(name: str) -> float | None:
+    value = os.getenv(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        logging.error(f"Invalid {name}={value!r}, ignoring it")
+        return None
+
+
+def capacity(platform: str) -> int | None:
+    """
+    How many accounts fit this run, from REFRESH_QUOTA_<PLATFORM> (API units)
+    and REFRESH_TIME_BUDGET (seconds). None when neither is set.
+    """
+    cost = REFRESH_COST[platform]
+    limits = []
+    quota = _env_number(f"REFRESH_QUOTA_{platform.upper()}")
+    if quota is not None and cost["units"]:
+        limits.append(quota // cost["units"])
+    seconds = _env_number("REFRESH_TIME_BUDGET")
+    if seconds is not None and cost["seconds"]:
+        limits.append(seconds // cost["seconds"])
+    return int(min(limits)) if limits else None
+
+
+# ============================== Scoring =====================================
+def _stats_sql(platform: str) -> str:
+    return f"""
+        SELECT h.handle, p.followers, last.ts AS last_refresh, m.followers_delta_30d
+        FROM unnest(%(handles)s::text[]) AS h(handle)
+        LEFT JOIN LATERAL (
+            SELECT {platform}_account AS account, {platform}_followers AS followers
+            FROM influencer_profiles WHERE {platform}_handle = h.handle
+            LIMIT 1
+        ) p ON true
+        LEFT JOIN LATERAL (
+            SELECT max(ts) AS ts FROM metric_snapshots s
+            WHERE s.platform = %(platform)s AND s.account = p.account AND s.metric = 'followers'
+        ) last ON true
+        LEFT JOIN influencer_metrics m ON m.platform = %(platform)s AND m.account = p.account
+    """
+
+
+def score(stats: pd.DataFrame) -> pd.Series:
+    """
+    Refresh priority per handle: days since the last refresh x follower tier x change rate.
+
+    Never-refreshed handles come first. The follower tier is log10(followers),
+    so a 1M account counts twice as much as a 1k one. The change rate is
+    |30 day follower delta| / followers; a fast mover gets up to 11x weight.
+    """
+    import numpy as np
+    import pandas as pd
+
+    now = pd.Timestamp.now(tz="UTC")
+    last = pd.to_datetime(stats["last_refresh"], utc=True, errors="coerce")
+    age_days = ((now - last).dt.total_seconds() / 86_400).clip(lower=0, upper=MAX_AGE_DAYS)
+    followers = pd.to_numeric(stats["followers"], errors="coerce").fillna(0)
+    tier = np.log10(followers + 10)
+    delta = pd.to_numeric(stats["followers_delta_30d"], errors="coerce").abs()
+    velocity = (delta / followers.where(followers > 0)).clip(upper=1).fillna(0)
+    return (age_days * tier * (1 + 10 * velocity)).fillna(math.inf)
+
+
+def plan(platform: str, usernames: list[str], limit: int | None = None) -> list[str]:
+    """
+    Order `usernames` by refresh priority and keep the subset that fits this run's budget.
+
+    `limit` overrides the env-derived capacity. On any lookup error the input is
+    returned unchanged, so a scheduler problem never stops an ETL run.
+    """
+    import numpy as np
+    import pandas as pd
+
+    limit = capacity(platform) if limit is None else limit
+    if limit is None or limit >= len(usernames):
+        return usernames
+    by_handle = {normalize_handle(u): u for u in usernames}
+    try:
+        with db.connection() as conn:
+            stats = pd.read_sql(
+                _stats_sql(platform), conn, params={"handles": list(by_handle), "platform": platform}
+            )
+    except Exception as e:
+        logging.error(f"Error scoring {platform} accounts, refreshing all of them: {e}")
+        return usernames
+    stats["score"] = score(stats)
+    picked = stats.sort_values("score", ascending=False).head(limit)
+    logging.info(
+        f"Scheduler: refreshing {len(picked)} of {len(usernames)} {platform} accounts "
+        f"({int(np.isinf(picked['score']).sum())} never refreshed); the rest wait for a later run."
+    )
+    return [by_handle[h] for h in picked["handle"]]
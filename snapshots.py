@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import argparse
+import logging
+from datetime import date, datetime, timezone
+from typing import TYPE_CHECKING
+
+import db
+import loader
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# The metric_snapshots table itself is created with the rest of the schema in db.py.
+
+# Rows older than `days` are thinned to one snapshot per `bucket`
+COMPACTION_TIERS = [(90, "day"), (365, "week")]
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+# Months whose partition is known to be committed; only added to after the creating transaction commits
+_partitions_ready: set[date] = set()
+
+
+def ensure_partitions(cur, ts: datetime, months_ahead: int = 1) -> list[date]:
+    """
+    Create the monthly partitions covering `ts` and the next `months_ahead` months.
+
+    Returns the months created in the caller's transaction; pass them to
+    `partitions_committed` once it commits, so a rolled-back CREATE is not cached.
+    """
+    start = _month_start(ts.date())
+    created = []
+    for _ in range(months_ahead + 1):
+        end = _next_month(start)
+        if start not in _partitions_ready:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS metric_snapshots_{start:%Y%m}
+                PARTITION OF metric_snapshots FOR VALUES FROM ('{start}') TO ('{end}')
+            """)
+            created.append(start)
+        start = end
+    return created
+
+
+def partitions_committed(months: list[date]):
+    _partitions_ready.update(months)
+
+
+# ============================== Append =====================================
+def record(platform: str, df, account_col: str, metrics: dict[str, str], ts: datetime | None = None) -> int:
+    """
+    Append one snapshot per account and metric.
+
+    `metrics` maps the stored metric name to the DataFrame column holding it,
+    e.g. {"followers": "follower_count"}. All rows share one timestamp per call.
+    `df` may also be an Arrow table straight from transform.run.
+    """
+    import pandas as pd
+
+    if df is not None and not isinstance(df, pd.DataFrame):
+        df = df.select([account_col, *metrics.values()]).to_pandas()
+    if df is None or df.empty:
+        return 0
+    ts = ts or datetime.now(timezone.utc)
+    accounts = df.drop_duplicates(account_col, keep="last")
+    long = accounts[[account_col, *metrics.values()]].melt(
+        id_vars=account_col, var_name="metric", value_name="value"
+    ).dropna(subset=["value"])
+    long["metric"] = long["metric"].map({column: name for name, column in metrics.items()})
+    long = long.rename(columns={account_col: "account"})
+    long["platform"] = platform
+    long["ts"] = ts.isoformat()
+    long["value"] = long["value"].astype("int64")
+
+    columns = ["platform", "account", "metric", "ts", "value"]
+    with db.connection() as conn, conn.cursor() as cur:
+        created = ensure_partitions(cur, ts)
+        buffer, options = loader.csv_buffer(long, columns)
+        cur.copy_expert(f"COPY metric_snapshots ({', '.join(columns)}) FROM STDIN WITH ({options})", buffer)
+    partitions_committed(created)
+    logging.info(f"Recorded {len(long)} {platform} metric snapshots.")
+    return len(long)
+
+
+# ============================== Queries =====================================
+def growth(platform: str, metric: str = "followers", days: int = 30, limit: int = 100) -> pd.DataFrame:
+    """First/last value per account over the last `days`, with absolute delta and per-day velocity."""
+    import pandas as pd
+
+    query = """
+        SELECT account,
+               (array_agg(value ORDER BY ts))[1] AS start_value,
+               (array_agg(value ORDER BY ts DESC))[1] AS end_value,
+               min(ts) AS first_seen,
+               max(ts) AS last_seen
+        FROM metric_snapshots
+        WHERE platform = %(platform)s AND metric = %(metric)s
+          AND ts >= now() - make_interval(days => %(days)s)
+        GROUP BY account
+        HAVING count(*) > 1
+    """
+    with db.connection() as conn:
+        df = pd.read_sql(query, conn, params={"platform": platform, "metric": metric, "days": days})
+    if df.empty:
+        return df
+    span_days = (df["last_seen"] - df["first_seen"]).dt.total_seconds() / 86_400
+    df["delta"] = df["end_value"] - df["start_value"]
+    df["velocity_per_day"] = df["delta"] / span_days.where(span_days > 0)
+    df["growth_pct"] = df["delta"] / df["start_value"].where(df["start_value"] > 0)
+    return df.sort_values("delta", ascending=False).head(limit).reset_index(drop=True)
+
+
+# ============================== Compaction =====================================
+def compact(tiers: list[tuple[int, str]] = COMPACTION_TIERS) -> int:
+    """Downsample old snapshots in place, keeping the latest row per account, metric and bucket."""
+    removed = 0
+    with db.connection() as conn, conn.cursor() as cur:
+        for days, bucket in tiers:
+            cur.execute(f"""
+                DELETE FROM metric_snapshots s
+                USING (
+                    SELECT platform, account, metric, ts,
+                           row_number() OVER (
+                               PARTITION BY platform, account, metric, date_trunc('{bucket}', ts)
+                               ORDER BY ts DESC
+                           ) AS rn
+                    FROM metric_snapshots
+                    WHERE ts < now() - make_interval(days => {int(days)})
+                ) old
+                WHERE old.rn > 1
+                  AND s.platform = old.platform AND s.account = old.account
+                  AND s.metric = old.metric AND s.ts = old.ts
+            """)
+            logging.info(f"Compacted {cur.rowcount} snapshots older than {days} days to one per {bucket}.")
+            removed += cur.rowcount
+    return removed
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
+    parser = argparse.ArgumentParser(description="Metric snapshot maintenance")
+    parser.add_argument("command", choices=["compact", "growth"])
+    parser.add_argument("--platform", default="instagram")
+    parser.add_argument("--metric", default="followers")
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+    try:
+        if args.command == "compact":
+            compact()
+        else:
+            print(growth(args.platform, args.metric, args.days).to_string(index=False))
+    finally:
+        db.close_pool()
@@ -1,9 +1,12 @@
+from __future__ import annotations
 
-from httpx import AsyncClient
-from playwright.async_api import async_playwright
+from httpx import AsyncClient, Limits
 from bs4 import BeautifulSoup
-import psycopg2
-from playwright._impl._api_structures import ProxySettings  
+
+import browsers
+import db
+from checkpoint import Checkpoint, Deadline
+from concurrency import AdaptiveLimiter, report_block, report_error
 
 import json
 import random
@@ -11,13 +14,14 @@ import asyncio
 import re
 import logging
 import os
+import time
+from collections import Counter
+from typing import TYPE_CHECKING
 
-from dotenv import load_dotenv
-
-load_dotenv()
+if TYPE_CHECKING:
+    import tweepy
 
 # ============================== Config =====================================
-logging.getLogger().setLevel(logging.INFO)
 non_prof_path = {"p", "explore", "reel", "tv"}
 
 def get_env_var(name: str) -> str:
@@ -26,26 +30,25 @@ def get_env_var(name: str) -> str:
         raise EnvironmentError(f"Missing environment variable: {name}")
     return value
 
-server1 = get_env_var("PROXY_SERVER")
-username1 = get_env_var("PROXY_USERNAME")
-password1 = get_env_var("PROXY_PASSWORD")
-
-
-
-proxy_str1 = f"http://{username1}:{password1}@{server1}"
+_proxy: dict | None = None
 
 
+def get_proxy() -> dict:
+    """Playwright proxy settings, read and validated on first use rather than at import."""
+    global _proxy
+    if _proxy is None:
+        _proxy = {
+            "server": get_env_var("PROXY_SERVER"),
+            "username": get_env_var("PROXY_USERNAME"),
+            "password": get_env_var("PROXY_PASSWORD"),
+        }
+    return _proxy
 
-def get_proxy(username, password, server):
-    proxy: ProxySettings | None = None
-    if server and username and password:
-        proxy = ProxySettings(
-            server=server,
-            username=username,
-            password=password)
-    return proxy
 
-proxy = get_proxy(username1, password1, server1)
+def proxy_url() -> str:
+    """The same proxy as a URL for httpx."""
+    proxy = get_proxy()
+    return f"http://{proxy['username']}:{proxy['password']}@{proxy['server']}"
 
 user_agents = [
     # Windows Chrome
@@ -64,6 +67,26 @@ user_agents = [
 
 keywords = ["comedian", "influencer", "actor", "blogger", "artist", "creator"]
 
+# Settings below are read when used, so a .env loaded by the entry point (cli.py or __main__) is seen
+def checkpoint_path() -> str:
+    return os.getenv("SEARCH_CHECKPOINT", "srh_checkpoint.json")
+
+
+# Candidates proposed by the mention graph of already-ingested posts (see mentions.py);
+# kept in the checkpoint like a keyword so a resumed run does not re-rank.
+MENTIONS_KEY = "@mentions"
+
+
+def mention_candidates() -> int:
+    return int(os.getenv("MENTION_CANDIDATES", "50"))
+
+
+# Every discovery path keeps Instagram accounts with at least this many followers
+MIN_FOLLOWERS = 50_000
+
+# YouTube Data API (same endpoint and YOUTUBE_API_KEY as yt.py)
+CHANNELS_URL = "https://www.googleapis.com/youtube/v3/channels"
+
 # keywords = ["comedian", "influencer", "actor", "blogger", "artist", "creator", "analyst", "fashion", "public figure",
 #             "beauty", "fitness", "digital creator"]
 
@@ -98,10 +121,55 @@ def is_profile_link(url: str) -> bool:
     return bool(path) and path not in non_prof_path
 
 
-async def usernames(keyword: str):
-    usernames = []
-    async with AsyncClient(proxy=proxy_str1, verify=False) as client:
-        for pages in range(0, 40, 10):
+class LookupUnavailable(Exception):
+    """An API tier could not answer (missing key, quota, network); use the browser tier instead."""
+
+
+_api_client: AsyncClient | None = None
+
+
+def get_api_client() -> AsyncClient:
+    """Shared client for the direct (non-proxied) API tiers."""
+    global _api_client
+    if _api_client is None or _api_client.is_closed:
+        _api_client = AsyncClient(timeout=15)
+    return _api_client
+
+
+# (platform, tier) -> Counter of "found" / "absent" / "fallback"
+tier_stats: dict[tuple[str, str], Counter] = {}
+
+
+def record_tier(platform: str, tier: str, outcome: str):
+    tier_stats.setdefault((platform, tier), Counter())[outcome] += 1
+
+
+def log_tier_stats():
+    """Log how often each resolver tier gave a definite answer."""
+    for (platform, tier), counts in sorted(tier_stats.items()):
+        total = sum(counts.values())
+        decided = counts["found"] + counts["absent"]
+        logging.info(
+            f"[{platform}/{tier}] hit rate {decided / total:.0%} ({decided}/{total}): "
+            f"found={counts['found']} absent={counts['absent']} fallback={counts['fallback']}"
+        )
+
+
+def is_google_block(url: str, html: str) -> bool:
+    """True when Google answered with its CAPTCHA / unusual-traffic page instead of results."""
+    return "/sorry/" in url or "unusual traffic" in html.lower() or 'id="captcha-form"' in html
+
+
+async def usernames(keyword: str, checkpoint: Checkpoint | None = None, deadline: Deadline | None = None):
+    """Collect Instagram usernames for a keyword, resuming from the last checkpointed page."""
+    start = checkpoint.keyword(keyword)["next_page"] if checkpoint else 0
+    usernames = list(checkpoint.keyword(keyword)["usernames"]) if checkpoint else []
+    async with AsyncClient(proxy=proxy_url(), verify=False) as client:
+        for pages in range(start, 40, 10):
+            if deadline and deadline.expired():
+                logging.warning(f"Time budget reached while searching '{keyword}', stopping at page {pages//10 + 1}")
+                return usernames
+            found = []
             try:
                 response = await client.get(
                     f"https://www.google.com/search?q=site:instagram.com+{keyword}+Nigeria&start={pages}",
@@ -121,19 +189,180 @@ async def usernames(keyword: str):
                         follower_text = follower_tag.get_text(strip=True) if follower_tag else "0"
                         followers = extract_follower(follower_text)
 
-                        if followers >= 50_000 and username not in usernames:
+                        if followers >= MIN_FOLLOWERS and username not in usernames:
                             usernames.append(username)
+                            found.append(username)
                             logging.info(f"Found {username} ({followers})")
             except Exception as e:
-                logging.error(f"Error fetching page {pages//10 + 1}: {e}")
-                continue
+                # Leave the page (and the keyword) open so a resumed run fetches it again
+                logging.error(f"Error fetching page {pages//10 + 1} for '{keyword}', stopping this keyword: {e}")
+                return usernames
+            if checkpoint:
+                checkpoint.record_page(keyword, pages + 10, found)
             await asyncio.sleep(random.randint(3, 6))
+    if checkpoint:
+        checkpoint.finish_keyword(keyword)
     return usernames
 
 
 
 
+async def instagram_api_followers(ig_business_id: str, handle: str) -> int | None:
+    """
+    Follower count of an Instagram business/creator account through business_discovery.
+
+    Returns None when the Graph API rejects the handle (unknown, private or
+    personal account). Raises LookupUnavailable on rate limits, transient
+    errors and network failures, which also count against the Graph API breaker.
+    """
+    import insta
+    import retry
+
+    circuit = retry.breaker("graph_api")
+    try:
+        circuit.before_call()
+    except retry.RetryLater as e:
+        raise LookupUnavailable(str(e))
+    params = {
+        "fields": f"business_discovery.username({handle}){{followers_count}}",
+        "access_token": insta.access_token(),
+    }
+    try:
+        res = await get_api_client().get(f"https://graph.facebook.com/{insta.GRAPH_API}/{ig_business_id}", params=params)
+    except Exception as e:
+        circuit.failure()
+        raise LookupUnavailable(f"Graph API request failed: {e}")
+    if res.status_code in (403, 429) or res.status_code >= 500:
+        circuit.failure()
+        raise LookupUnavailable(f"Graph API status {res.status_code}")
+    try:
+        data = res.json()
+    except ValueError:
+        data = {}
+    err = data.get("error") if isinstance(data, dict) else None
+    if err and insta.retryable_error(err):
+        circuit.failure()
+        raise LookupUnavailable(f"Graph API rate limit or transient error: {err.get('message')}")
+    circuit.success()
+    if err or res.status_code != 200 or "business_discovery" not in data:
+        return None
+    return data["business_discovery"].get("followers_count") or 0
+
+
+async def verify_instagram_candidates(
+    handles: list[str], deadline: Deadline | None = None, limiter: AdaptiveLimiter | None = None
+) -> tuple[list[str], bool]:
+    """
+    Keep the mention-graph candidates that are Instagram business/creator accounts
+    with at least MIN_FOLLOWERS, checked with the Graph API account fields.
+
+    Lookups share the async API client and run under `limiter`. Rejected handles
+    are stored (mentions.reject) so later runs do not check them again. Returns the
+    verified handles and whether every candidate got an answer: the deadline, a
+    rate limit or an unusable Graph API stop the check early.
+    """
+    import insta
+    import mentions
+    import retry
+
+    if not handles:
+        return [], True
+    try:
+        ig_business_id = await asyncio.to_thread(insta.get_instagram_business_id_cached, insta.fb_page_id())
+    except retry.RetryLater as e:
+        logging.error(f"Graph API unavailable, mention candidates not verified: {e}")
+        return [], False
+    if not ig_business_id:
+        return [], False
+
+    limiter = limiter or AdaptiveLimiter("instagram")
+    verified, rejected = set(), {}
+    stopped = False
+
+    async def verify(handle):
+        nonlocal stopped
+        async with limiter.slot():
+            if stopped or (deadline and deadline.expired()):
+                return
+            try:
+                followers = await instagram_api_followers(ig_business_id, handle)
+            except LookupUnavailable as e:
+                report_block(str(e))
+                if not stopped:
+                    logging.warning(f"Stopped verifying mention candidates at @{handle}: {e}")
+                stopped = True
+                return
+        if followers is None:
+            rejected[handle] = "not an Instagram business/creator account"
+        elif followers < MIN_FOLLOWERS:
+            rejected[handle] = f"{followers} followers"
+        else:
+            verified.add(handle)
+            logging.info(f"Found {handle} ({followers}) via mentions")
+
+    await asyncio.gather(*(verify(handle) for handle in handles))
+    await asyncio.to_thread(mentions.reject, "instagram", rejected)
+    complete = len(verified) + len(rejected) == len(handles)
+    logging.info(
+        f"Mention candidates: {len(verified)} of {len(handles)} are Instagram accounts with enough followers"
+        f", {len(rejected)} rejected{'' if complete else ', the rest left for the next run'}."
+    )
+    return [handle for handle in handles if handle in verified], complete
+
+
 # ------------------- YOUTUBE -------------------
+_youtube_api_down = False
+
+
+async def youtube_api_lookup(username: str) -> str | None:
+    """
+    Exact handle check through channels.list?forHandle.
+
+    Returns the channel handle, or None when no channel owns @username.
+    Raises LookupUnavailable when the API cannot answer; a quota or key error
+    switches the tier off for the rest of the run.
+    """
+    global _youtube_api_down
+    api_key = os.getenv("YOUTUBE_API_KEY")
+    if not api_key or _youtube_api_down:
+        raise LookupUnavailable("YouTube Data API not configured")
+
+    params = {"part": "id,snippet", "forHandle": f"@{username}", "key": api_key}
+    try:
+        res = await get_api_client().get(CHANNELS_URL, params=params)
+    except Exception as e:
+        raise LookupUnavailable(f"YouTube Data API request failed: {e}")
+
+    if res.status_code in (400, 403):
+        _youtube_api_down = True
+        raise LookupUnavailable(f"YouTube Data API refused request ({res.status_code}): {res.text[:200]}")
+    if res.status_code != 200:
+        raise LookupUnavailable(f"YouTube Data API status {res.status_code}")
+
+    items = res.json().get("items") or []
+    if not items:
+        return None
+    custom_url = items[0].get("snippet", {}).get("customUrl") or f"@{username}"
+    handle = custom_url.lstrip("@")
+    logging.info(f" YouTube API match: {handle}")
+    return handle
+
+
+async def youtube_resolve(username: str):
+    """API tier for the exact handle; the browser search only runs for fuzzy matches."""
+    try:
+        handle = await youtube_api_lookup(username)
+        record_tier("youtube", "api", "found" if handle else "absent")
+        if handle:
+            return handle
+        logging.info(f" No exact YouTube handle for {username}, trying fuzzy search...")
+    except LookupUnavailable as e:
+        record_tier("youtube", "api", "fallback")
+        logging.warning(f" {e}; using browser search for {username}")
+    handle = await youtube_search(username)
+    record_tier("youtube", "browser", "found" if handle else "absent")
+    return handle
+
 
 user_agents = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
@@ -148,13 +377,12 @@ async def youtube_fallback(username: str):
     search_url = f"https://www.youtube.com/results?search_query={username}"
 
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent=random.choice(user_agents),
-                ignore_https_errors=True,
-                viewport={"width": 1280, "height": 800}
-            )
+        pool = await browsers.get_browser_pool()
+        async with pool.context(
+            user_agent=random.choice(user_agents),
+            ignore_https_errors=True,
+            viewport={"width": 1280, "height": 800}
+        ) as context:
             page = await context.new_page()
 
             await page.goto(search_url, timeout=15000)
@@ -181,22 +409,15 @@ async def youtube_fallback(username: str):
         print(f"youtube_fallback error for {username}: {e}")
         return None
 
-    finally:
-        try:
-            await context.close()
-            await browser.close()
-        except Exception:
-            pass
-            
+
 async def youtube_search(username: str):
-    browser = None
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True, proxy=proxy)
-            context = await browser.new_context(
-                user_agent=random.choice(user_agents),
-                ignore_https_errors=True
-            )
+        pool = await browsers.get_browser_pool()
+        async with pool.context(
+            proxy=get_proxy(),
+            user_agent=random.choice(user_agents),
+            ignore_https_errors=True
+        ) as context:
             page = await context.new_page()
 
             query = f"site:youtube.com/@{username}"
@@ -205,6 +426,8 @@ async def youtube_search(username: str):
             await page.wait_for_timeout(random.randint(1200, 2500))
 
             html = await page.content()
+            if is_google_block(page.url, html):
+                report_block(f"Google CAPTCHA on YouTube lookup for {username}")
             soup = BeautifulSoup(html, "html.parser")
 
             for a_tag in soup.select("a[href^='https://www.youtube.com/@']"):
@@ -224,26 +447,23 @@ async def youtube_search(username: str):
                     logging.info(f" YouTube possible match: {handle}")
                     return handle
 
-            # Fallback if Google search failed
-            logging.warning(f" No YouTube match via Google for {username}. Trying fallback...")
-            fb_yt = await youtube_fallback(username)
-            if fb_yt:
-                logging.info(f" Found via fallback: {fb_yt}")
-                return fb_yt
+        # Fallback if Google search failed (after releasing the pooled context, so it cannot starve itself)
+        logging.warning(f" No YouTube match via Google for {username}. Trying fallback...")
+        fb_yt = await youtube_fallback(username)
+        if fb_yt:
+            logging.info(f" Found via fallback: {fb_yt}")
+            return fb_yt
 
-            logging.warning(f" No match found for {username}")
-            return None
+        logging.warning(f" No match found for {username}")
+        return None
 
     except Exception as e:
         logging.error(f" YouTube search error for {username}: {e}")
+        report_error(str(e))
         # fallback if Google fails entirely
         fb_yt = await youtube_fallback(username)
         return fb_yt
 
-    finally:
-        if browser:
-            await browser.close()
-
 # ============================== TIKTOK ============================
 
 def extract_username(link: str) -> str | None:
@@ -252,14 +472,89 @@ def extract_username(link: str) -> str | None:
     return match.group(1) if match else None
 
 
+TIKTOK_STATE = re.compile(
+    r'<script[^>]+id="__UNIVERSAL_DATA_FOR_REHYDRATION__"[^>]*>(.*?)</script>', re.S
+)
+# webapp.user-detail statusCode values meaning the account does not exist or is gone
+TIKTOK_MISSING_CODES = {10202, 10221, 10222, 10223}
+
+_probe_client: AsyncClient | None = None
+
+
+def get_probe_client() -> AsyncClient:
+    """Pooled proxied client for direct profile probes."""
+    global _probe_client
+    if _probe_client is None or _probe_client.is_closed:
+        _probe_client = AsyncClient(
+            proxy=proxy_url(),
+            verify=False,
+            timeout=20,
+            follow_redirects=True,
+            limits=Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _probe_client
+
+
+async def tiktok_probe(username: str) -> str | None:
+    """
+    Check tiktok.com/@username directly.
+
+    A 404 or a "user not found" status in the embedded page state means the
+    handle does not exist (None); a matching uniqueId means it does. Anything
+    else (CAPTCHA, empty shell, 403/429) raises LookupUnavailable.
+    """
+    try:
+        res = await get_probe_client().get(
+            f"https://www.tiktok.com/@{username}",
+            headers={"User-Agent": random.choice(user_agents), "Accept-Language": "en-US,en;q=0.9"},
+        )
+    except Exception as e:
+        raise LookupUnavailable(f"TikTok probe failed: {e}")
+
+    if res.status_code == 404:
+        return None
+    if res.status_code != 200:
+        raise LookupUnavailable(f"TikTok probe status {res.status_code}")
+
+    match = TIKTOK_STATE.search(res.text)
+    if not match:
+        raise LookupUnavailable("TikTok probe returned no page state")
+    try:
+        detail = json.loads(match.group(1))["__DEFAULT_SCOPE__"]["webapp.user-detail"]
+    except (ValueError, KeyError, TypeError):
+        raise LookupUnavailable("TikTok probe page state has no user detail")
+
+    status = detail.get("statusCode")
+    if status in TIKTOK_MISSING_CODES:
+        return None
+    unique_id = (detail.get("userInfo") or {}).get("user", {}).get("uniqueId")
+    if status == 0 and unique_id and unique_id.lower() == username.lower():
+        logging.info(f" TikTok probe match: {unique_id}")
+        return unique_id
+    raise LookupUnavailable(f"TikTok probe ambiguous (statusCode={status})")
+
+
+async def tiktok_resolve(username: str):
+    """HTTP probe first; the Google SERP is only used when the probe is ambiguous."""
+    try:
+        handle = await tiktok_probe(username)
+        record_tier("tiktok", "probe", "found" if handle else "absent")
+        return handle
+    except LookupUnavailable as e:
+        record_tier("tiktok", "probe", "fallback")
+        logging.info(f" {e}; using Google search for {username}")
+    handle = await tiktok_search(username)
+    record_tier("tiktok", "serp", "found" if handle else "absent")
+    return handle
+
+
 async def tiktok_search(username):
     """Check if a TikTok profile exists via Google search."""
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True,
-                                             proxy=proxy)
-            context = await browser.new_context(user_agent=random.choice(user_agents),
-                                                ignore_https_errors=True)
+        pool = await browsers.get_browser_pool()
+        async with pool.context(proxy=get_proxy(),
+                                user_agent=random.choice(user_agents),
+                                ignore_https_errors=True) as context:
             page = await context.new_page()
 
             query = f"site:tiktok.com/@{username}"
@@ -268,6 +563,9 @@ async def tiktok_search(username):
             await page.wait_for_timeout(1500)
 
             html = await page.content()
+            if is_google_block(page.url, html):
+                report_block(f"Google CAPTCHA on TikTok lookup for {username}")
+                return None
             soup = BeautifulSoup(html, "html.parser")
 
             # Find first TikTok result
@@ -281,12 +579,9 @@ async def tiktok_search(username):
 
     except Exception as e:
         logging.error(f"TikTok error for {username}: {e}")
+        report_error(str(e))
         return None
 
-    finally:
-        if 'browser' in locals():
-            await browser.close()
-
    
 
 # ------------------- X / TWITTER -------------------
@@ -297,16 +592,127 @@ def extract_x_username(link: str) -> str | None:
     return match.group(1) if match else None
 
 
+X_HANDLE = re.compile(r"^[A-Za-z0-9_]{1,15}$")
+
+
+class XHandleBatcher:
+    """
+    Verifies X handles in batches of up to 100 with the v2 users lookup.
+
+    `lookup` queues a handle and waits for its batch; `prefetch` queues every
+    known candidate up front so batches fill instead of waiting on the
+    per-platform limiter. Resolves to the canonical handle, or None when no
+    account exists. Raises LookupUnavailable when the API cannot answer,
+    including while backing off after a 429 (the client never sleeps on the
+    rate limit itself, so a worker thread is never held past the deadline).
+    """
+
+    def __init__(self, client: tweepy.Client | None, batch_size: int = 100, linger: float = 2.0):
+        self.client = client
+        self.batch_size = batch_size
+        self.linger = linger
+        self.available = client is not None
+        self._resume_at = 0.0
+        self._futures: dict[str, asyncio.Future] = {}
+        self._queue: list[str] = []
+        self._task: asyncio.Task | None = None
+
+    def prefetch(self, usernames):
+        if not self.available:
+            return
+        for username in usernames:
+            self._enqueue(username)
+
+    async def lookup(self, username: str) -> str | None:
+        if not X_HANDLE.match(username):
+            # Instagram allows '.', X does not; such a handle cannot exist there
+            return None
+        if not self.available:
+            raise LookupUnavailable("X users lookup not available")
+        if asyncio.get_running_loop().time() < self._resume_at:
+            raise LookupUnavailable("X users lookup rate limited")
+        return await asyncio.shield(self._enqueue(username))
+
+    def _enqueue(self, username: str) -> asyncio.Future | None:
+        if not X_HANDLE.match(username):
+            return None
+        key = username.lower()
+        future = self._futures.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._futures[key] = future
+            self._queue.append(key)
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._run())
+        return future
+
+    async def _run(self):
+        while self._queue:
+            if len(self._queue) < self.batch_size:
+                await asyncio.sleep(self.linger)
+            batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+            await self._verify(batch)
+
+    async def _verify(self, batch: list[str]):
+        import tweepy
+
+        found, error = {}, None
+        if self.available:
+            try:
+                response = await asyncio.to_thread(self.client.get_users, usernames=batch, user_fields=["username"])
+                found = {user.username.lower(): user.username for user in response.data or []}
+                logging.info(f" X users lookup: {len(found)}/{len(batch)} handles exist")
+            except tweepy.TooManyRequests as e:
+                # Back off until the window resets and slow the X lookups down
+                reset = int(e.response.headers.get("x-rate-limit-reset", time.time() + 900))
+                self._resume_at = asyncio.get_running_loop().time() + max(reset - time.time(), 60)
+                get_limiters()["x"].record(0.0, blocked=True)
+                error = LookupUnavailable(f"X users lookup rate limited: {e}")
+            except (tweepy.Unauthorized, tweepy.Forbidden) as e:
+                self.available = False
+                error = LookupUnavailable(f"X users lookup refused: {e}")
+            except Exception as e:
+                error = LookupUnavailable(f"X users lookup failed: {e}")
+        else:
+            error = LookupUnavailable("X users lookup not available")
+
+        for key in batch:
+            future = self._futures[key]
+            if future.done():
+                continue
+            if error:
+                # Forget the entry so a later lookup can retry the API
+                del self._futures[key]
+                future.set_exception(error)
+                future.exception()
+            else:
+                future.set_result(found.get(key))
+
+
+_x_batcher: XHandleBatcher | None = None
+
+
+def get_x_batcher() -> XHandleBatcher:
+    global _x_batcher
+    if _x_batcher is None:
+        import tweepy
+
+        # X API v2, same bearer token as xuser.py
+        bearer_token = os.getenv("X_BEARER_TOKEN") or os.getenv("x_bearer_token")
+        client = tweepy.Client(bearer_token=bearer_token, wait_on_rate_limit=False) if bearer_token else None
+        _x_batcher = XHandleBatcher(client)
+    return _x_batcher
+
+
 async def x_search(username: str):
     """Scrape the handle (@username) from an X (Twitter) profile."""
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True,
-                                              proxy=proxy)
-            context = await browser.new_context(
-                user_agent=random.choice(user_agents),
-                ignore_https_errors=True
-            )
+        pool = await browsers.get_browser_pool()
+        async with pool.context(
+            proxy=get_proxy(),
+            user_agent=random.choice(user_agents),
+            ignore_https_errors=True
+        ) as context:
             page = await context.new_page()
 
             search_url = f"https://x.com/{username}"
@@ -322,6 +728,11 @@ async def x_search(username: str):
             except Exception:
                 pass
 
+            content = (await page.content()).lower()
+            if "doesn’t exist" in content or "doesn't exist" in content:
+                logging.warning(f" X account {username} does not exist")
+                return None
+
             # Ensure the @handle element is visible
             await page.wait_for_selector('span:has-text("@")', timeout=10000)
 
@@ -342,129 +753,242 @@ async def x_search(username: str):
 
     except Exception as e:
         logging.error(f" X lookup error for {username}: {e}")
+        report_error(str(e))
         return None
 
-    finally:
-        if "browser" in locals():
-            await browser.close()
-# ------------------- MAIN -------------------
-# ------------------- MAIN -------------------
-def connect_to_db():
-    """Connect to PostgreSQL database."""
-    host = get_env_var("DB_HOST")
-    database = get_env_var("DB_NAME")
-    user = get_env_var("DB_USERNAME")
-    password = get_env_var("DB_PASS")
-    port = get_env_var("DB_PORT")
-
+async def x_resolve(username: str):
+    """Batched API verification; the browser scrape is only the fallback when the API is unavailable."""
     try:
-        conn = psycopg2.connect(
-            host=host,
-            dbname=database,
-            user=user,
-            password=password,
-            port=port,
-            sslmode="require"
-        )
-        conn.autocommit = True
-        return conn
-    except Exception as e:
-        logging.error(f"Error connecting to database: {e}")
-        return None
+        handle = await get_x_batcher().lookup(username)
+        record_tier("x", "api", "found" if handle else "absent")
+        return handle
+    except LookupUnavailable as e:
+        record_tier("x", "api", "fallback")
+        logging.warning(f" {e}; using browser lookup for {username}")
+    handle = await x_search(username)
+    record_tier("x", "browser", "found" if handle else "absent")
+    return handle
 
 
-def create_table():
-    """Create table if it does not exist."""
-    conn = connect_to_db()
-    if not conn:
-        return
-
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            DROP TABLE IF EXISTS username_search;
-            CREATE TABLE IF NOT EXISTS username_search(
-                id SERIAL PRIMARY KEY,
-                instagram_username VARCHAR(150),
-                youtube_username VARCHAR(150),
-                tiktok_username VARCHAR(150),
-                x_username VARCHAR(150),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        """)
-        logging.info(" username_search table ready.")
-    except Exception as e:
-        logging.error(f"Error creating table: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+# ------------------- MAIN -------------------
+INSERT_USERNAMES_SQL = """
+    INSERT INTO username_search (instagram_username, youtube_username, tiktok_username, x_username)
+    SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::varchar[], $4::varchar[])
+    ON CONFLICT (instagram_username) DO UPDATE SET
+        youtube_username = EXCLUDED.youtube_username,
+        tiktok_username = EXCLUDED.tiktok_username,
+        x_username = EXCLUDED.x_username;
+"""
 
 
-def insert_username(instagram, youtube, tiktok, x):
-    """Insert username record into PostgreSQL."""
-    conn = connect_to_db()
-    if not conn:
-        return
+class UsernameWriter:
+    """
+    Background writer for username_search.
 
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            INSERT INTO username_search (instagram_username, youtube_username, tiktok_username, x_username)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT DO NOTHING;
-        """, (instagram, youtube, tiktok, x))
-        logging.info(f" Inserted: {instagram}")
-    except Exception as e:
-        logging.error(f" Error inserting {instagram}: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    `submit` only appends to an in-memory queue; a single task drains it into
+    batched multi-row INSERTs over the shared asyncpg pool, so the event loop never
+    waits on a TLS handshake or a round trip. `on_saved` is called with the
+    usernames of every batch that committed.
+    """
 
+    def __init__(self, on_saved=None, batch_size: int = 50, flush_interval: float = 2.0):
+        self.on_saved = on_saved
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pool = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    async def start(self, drop: bool = False):
+        """Borrow the shared pool, prepare the table (dropping it on a fresh run) and start draining."""
+        self.pool = await db.get_async_pool()
+        async with self.pool.acquire() as conn:
+            if drop:
+                await conn.execute("DROP TABLE IF EXISTS username_search;")
+            await db.ensure_schema_async(conn)
+        logging.info(" username_search table ready.")
+        self._task = asyncio.create_task(self._drain())
+
+    def submit(self, instagram, youtube, tiktok, x):
+        self._queue.put_nowait((instagram, youtube, tiktok, x))
+
+    async def close(self):
+        """Flush everything still queued."""
+        if self._task:
+            self._queue.put_nowait(None)
+            await self._task
+
+    async def _drain(self):
+        closing = False
+        while not closing:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=max(timeout, 0))
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+
+    async def _write(self, batch: list[tuple]):
+        # ON CONFLICT DO UPDATE cannot touch the same row twice in one statement; the last answer wins
+        batch = list({item[0]: item for item in batch}.values())
+        columns = [list(col) for col in zip(*batch)]
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.execute(INSERT_USERNAMES_SQL, *columns)
+            logging.info(f" Inserted {len(batch)} usernames: {', '.join(columns[0])}")
+        except Exception as e:
+            logging.error(f" Error inserting {len(batch)} usernames: {e}")
+            return
+        if self.on_saved:
+            for username in columns[0]:
+                self.on_saved(username)
+
+
+# A platform lookup that was blocked or stopped by the deadline; not an answer, unlike None
+UNANSWERED = object()
+
+_limiters: dict[str, AdaptiveLimiter] = {}
+
+
+def get_limiters(parallel_limit: int = 3) -> dict[str, AdaptiveLimiter]:
+    """Process-wide per-platform limiters, shared by every process_username call."""
+    for platform in ("instagram", "youtube", "tiktok", "x"):
+        if platform not in _limiters:
+            _limiters[platform] = AdaptiveLimiter(platform, initial=parallel_limit)
+    return _limiters
+
+
+async def process_username(
+    username: str,
+    checkpoint: Checkpoint | None = None,
+    limiters: dict[str, AdaptiveLimiter] | None = None,
+    deadline: Deadline | None = None,
+    writer: UsernameWriter | None = None,
+) -> dict:
+    """
+    Run platform searches for a single username in parallel, each gated by its platform limiter.
 
-async def process_username(username: str) -> dict:
-    """Run platform searches for a single username in parallel."""
+    The result is queued on `writer` (when given) rather than written inline,
+    and only once every platform gave an answer: a blocked lookup or one the
+    deadline stopped leaves the username unsaved, so the next run retries it.
+    """
     results = {"instagram": username, "youtube": None, "tiktok": None, "x": None}
+    searches = {"youtube": youtube_resolve, "tiktok": tiktok_resolve, "x": x_resolve}
+    done = checkpoint.resolved(username) if checkpoint else {}
+    limiters = limiters or get_limiters()
+
+    async def search(platform):
+        if platform in done:
+            return done[platform]
+        async with limiters[platform].slot() as slot:
+            if deadline and deadline.expired():
+                return UNANSWERED
+            handle = await searches[platform](username)
+        # A blocked lookup is not an answer, leave it for the next run
+        if slot.blocked:
+            return UNANSWERED
+        if checkpoint:
+            checkpoint.record_platform(username, platform, handle)
+        return handle
+
+    answers = await asyncio.gather(*(search(platform) for platform in searches))
+    for platform, handle in zip(searches, answers):
+        results[platform] = None if handle is UNANSWERED else handle
+
+    # Queue the result for the background DB writer
+    if writer and UNANSWERED not in answers:
+        writer.submit(username, results["youtube"], results["tiktok"], results["x"])
 
-    yt_task = asyncio.create_task(youtube_search(username))
-    tt_task = asyncio.create_task(tiktok_search(username))
-    tw_task = asyncio.create_task(x_search(username))
-
-    yt, tt, tw = await asyncio.gather(yt_task, tt_task, tw_task)
+    return results
 
-    results["youtube"] = yt
-    results["tiktok"] = tt
-    results["x"] = tw
 
-    # Save each user result directly into DB
-    insert_username(username, yt, tt, tw)
+async def close_clients():
+    """Close the HTTP clients, browser pool and DB pools this module opened."""
+    for client in (_api_client, _probe_client):
+        if client is not None:
+            await client.aclose()
+    await browsers.close_browser_pool()
+    await db.close_async_pool()
+    db.close_pool()
 
-    return results
 
+async def run_search(parallel_limit: int = 3, deadline: Deadline | None = None, close_shared: bool = True):
+    """
+    Main search pipeline, resumable from the checkpoint at `checkpoint_path()`.
 
-async def run_search(parallel_limit: int = 3):
-    """Main search pipeline."""
+    `parallel_limit` is the starting concurrency per platform; each platform's
+    AdaptiveLimiter then tunes it from latency, errors and block signals.
+    With `close_shared=False` the pools and clients stay open for the caller
+    (the orchestrator) to reuse and close.
+    """
     logging.info("Starting influencer discovery...")
-    create_table()
+    checkpoint = Checkpoint(checkpoint_path())
+    deadline = deadline or Deadline.from_env()
+    writer = UsernameWriter(on_saved=checkpoint.mark_saved)
+    await writer.start(drop=not checkpoint.resumed)
 
-    all_usernames = []
     for kw in keywords:
-        users = await usernames(kw)
-        all_usernames.extend(users)
-
-    ig_usernames = list(set(all_usernames))
-    logging.info(f"Total Instagram usernames found: {len(ig_usernames)}")
-
-    sem = asyncio.Semaphore(parallel_limit)
-
-    async def sem_task(username):
-        async with sem:
-            return await process_username(username)
-
-    tasks = [asyncio.create_task(sem_task(u)) for u in ig_usernames]
-    await asyncio.gather(*tasks)
-
-    logging.info(" All usernames saved to database.")
+        if deadline.expired():
+            logging.warning("Time budget reached, no more keywords will be searched.")
+            break
+        if checkpoint.keyword(kw)["done"]:
+            continue
+        await usernames(kw, checkpoint, deadline)
+
+    limiters = get_limiters(parallel_limit)
+    if mention_candidates() and not deadline.expired() and not checkpoint.keyword(MENTIONS_KEY)["done"]:
+        import mentions
+
+        candidates = await asyncio.to_thread(mentions.candidates, mention_candidates(), platform="instagram")
+        found, complete = await verify_instagram_candidates(candidates, deadline, limiters["instagram"])
+        # Verified handles are kept even when the check stopped early; rejected ones are in the DB
+        checkpoint.record_page(MENTIONS_KEY, 0, found)
+        if complete:
+            checkpoint.finish_keyword(MENTIONS_KEY)
+
+    ig_usernames = checkpoint.discovered()
+    pending = [u for u in ig_usernames if not checkpoint.is_saved(u)]
+    logging.info(f"Total Instagram usernames found: {len(ig_usernames)} ({len(pending)} still to resolve)")
+
+    get_x_batcher().prefetch(u for u in pending if "x" not in checkpoint.resolved(u))
+    tasks = [asyncio.create_task(process_username(u, checkpoint, limiters, deadline, writer)) for u in pending]
+    unfinished = set()
+    if tasks:
+        _, unfinished = await asyncio.wait(tasks, timeout=deadline.remaining())
+    for task in unfinished:
+        task.cancel()
+    await asyncio.gather(*unfinished, return_exceptions=True)
+    await writer.close()
+    checkpoint.flush()
+    for limiter in limiters.values():
+        logging.info(limiter.report())
+    log_tier_stats()
+    if close_shared:
+        await close_clients()
+
+    complete = all(checkpoint.keyword(kw)["done"] for kw in keywords) and all(
+        checkpoint.is_saved(u) for u in ig_usernames
+    )
+    if complete:
+        checkpoint.clear()
+        logging.info(" All usernames saved to database.")
+    else:
+        logging.warning(f" Run stopped early, progress saved to {checkpoint_path()} for the next run.")
 
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     asyncio.run(run_search())
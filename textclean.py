@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import re
+from functools import cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# ============================== Patterns =====================================
+URLS = r"https?://\S+|www\.\S+"
+MENTIONS = r"@\w+"
+SYMBOLS = r"[#|@/&]"
+
+# mode -> what one regex pass removes
+MODES = {
+    "text": (URLS, MENTIONS, SYMBOLS),  # bios, captions, descriptions, tweets
+    "emoji": (),                        # names and handles: emojis only
+}
+
+
+@cache
+def emoji_class() -> str:
+    """
+    Character class of every non-ASCII code point used in an emoji sequence,
+    built once from the `emoji` package's table (ZWJ, variation selectors and
+    skin tones included), so a run of emojis is removed by one class match.
+    """
+    import emoji
+
+    points = sorted({ord(ch) for sequence in emoji.EMOJI_DATA for ch in sequence if ord(ch) > 0x7F})
+    ranges, start, prev = [], points[0], points[0]
+    for point in points[1:] + [None]:
+        if point is not None and point == prev + 1:
+            prev = point
+            continue
+        ranges.append(re.escape(chr(start)) + (f"-{re.escape(chr(prev))}" if prev > start else ""))
+        if point is not None:
+            start = prev = point
+    return f"[{''.join(ranges)}]+"
+
+
+@cache
+def pattern(mode: str) -> re.Pattern:
+    return re.compile("|".join((*MODES[mode], emoji_class())))
+
+
+# ============================== Cleaning =====================================
+def clean(value, mode: str = "text") -> str:
+    """Clean one value in a single regex pass; whitespace is collapsed, missing values become ''."""
+    import numpy as np
+    import pandas as pd
+
+    if value is None or value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    return " ".join(pattern(mode).sub(" ", str(value)).split())
+
+
+def clean_column(series: pd.Series, mode: str = "text") -> pd.Series:
+    """
+    Vectorised `clean`: each distinct value is cleaned once and broadcast back,
+    so a bio repeated on every post row of an account costs one regex pass.
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(series)
+    # codes are -1 for missing values, which index the trailing "" entry
+    lookup = np.array([clean(value, mode) for value in uniques] + [""], dtype=object)
+    return pd.Series(lookup[codes], index=series.index, name=series.name)
+
+
+def clean_frame(df: pd.DataFrame, columns: dict[str, str]) -> pd.DataFrame:
+    """Clean several columns at once; `columns` maps column name to mode."""
+    return df.assign(**{column: clean_column(df[column], mode) for column, mode in columns.items()})
+
+
+# ============================== SQL =====================================
+def sql(column: str, mode: str = "text") -> str:
+    """
+    DuckDB expression doing what `clean` does, for the transform stage (see transform.py).
+    The pattern is bound as `$pattern_<mode>`; pass `sql_params(modes)` with the query.
+    """
+    return (
+        f"trim(regexp_replace(regexp_replace(coalesce(CAST({column} AS VARCHAR), ''), "
+        f"$pattern_{mode}, ' ', 'g'), '\\s+', ' ', 'g'))"
+    )
+
+
+def sql_params(modes) -> dict[str, str]:
+    """Bound patterns for the modes a query uses (DuckDB rejects unused named parameters)."""
+    return {f"pattern_{mode}": pattern(mode).pattern for mode in set(modes)}
@@ -1,37 +1,26 @@
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
-import psycopg2
-from sqlalchemy import create_engine
-
-
-
-import emoji
 import asyncio
 import random
 import logging
 import re
-
-
-import time
-
-
-
-from dotenv import load_dotenv
 import os
-import pandas as pd
 
-# ============================================ Config ===========================================================
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-load_dotenv()
+import browsers
+import db
+import landing
+import metrics
+import probe
+import profiles
+import records
+import scheduler
+import snapshots
+import transform
 
+# ============================================ Config ===========================================================
 def get_env(text:str):
     return os.getenv(text)
 
 
 
-def remove_emojis(text: str) -> str:
-    return emoji.replace_emoji(text, replace="")
-
 def get_env_var(name: str) -> str:
     value = os.getenv(name)
     if not value:
@@ -40,32 +29,6 @@ def get_env_var(name: str) -> str:
 
 
 
-def connect_to_database():
-    host = os.getenv("DB_HOST")
-    database = os.getenv("DB_NAME")
-    user = os.getenv("DB_USERNAME")
-    password = os.getenv("DB_PASSWORD")
-    port = os.getenv("DB_PORT")
-    if not all([host, database, user, password, port]):
-        logging.error("Missing required environment variables")
-        return None
-    try:
-  
-        engine = psycopg2.connect(
-            host=host,
-            dbname=database,
-            user=user,
-            password=password,
-            port=port,
-            sslmode="require"
-            )
-        logging.info("Connection to PostgreSQL database successful")
-        return engine
-
-    except Exception as e:
-        logging.error(f"Error connecting to database: {e}")
-        return None
-
 # ============ User Agents ============
 user_agents = [
     # Chrome - Windows
@@ -110,41 +73,32 @@ def extract_number(text):
     val = float(val)
     return int(val * {'': 1, 'k': 1_000, 'm': 1_000_000, 'b': 1_000_000_000}[suf])
 
+def page_counters(html):
+    """Cheap counters from the profile's embedded state, readable before any scrolling."""
+    match = re.search(r'"videoCount":(\d+)', html or "")
+    return {"video_count": int(match.group(1)) if match else None}
+
+
+def newest_video_id(username, html):
+    """Post cursor for a scraped page: the highest (newest) video ID linked from the profile's grid."""
+    ids = [int(video_id) for video_id in re.findall(rf"/@{re.escape(username)}/video/(\d+)", html or "")]
+    return {"since_id": str(max(ids))} if ids else None
+
 # ======================== Scraper ===============================
-async def get_tiktok_profile(username):
+async def get_tiktok_profile(username, refresh=None):
+    """
+    Load a profile page and return its HTML. With a `refresh` probe the
+    video grid is only scrolled when the account's video count moved or it is due.
+
+    TikTok has no cheap counters endpoint usable without request signing, so
+    the probe still pays for the full page load (browser context, navigation,
+    followers selector); an unchanged account only saves the scroll and the
+    wait for the grid to fill.
+    """
     logging.info(f"Fetching TikTok profile for @{username} ...")
     
-    async with async_playwright() as p:
-        launch_args = [
-            '--disable-gpu',
-            '--disable-dev-shm-usage',
-            '--disable-setuid-sandbox',
-            '--no-sandbox',
-            '--disable-blink-features=AutomationControlled',
-            '--disable-infobars',
-            '--no-first-run',
-            '--no-default-browser-check',
-            '--disable-extensions',
-            '--disable-background-networking',
-            '--disable-background-timer-throttling',
-            '--disable-backgrounding-occluded-windows',
-            '--disable-client-side-phishing-detection',
-            '--disable-component-update',
-            '--disable-default-apps',
-            '--disable-features=IsolateOrigins,site-per-process,TranslateUI',
-            '--disable-hang-monitor',
-            '--disable-popup-blocking',
-            '--disable-prompt-on-repost',
-            '--disable-renderer-backgrounding',
-            '--disable-sync',
-            '--hide-scrollbars',
-            '--mute-audio',
-            '--window-size=1366,768',
-        ]
-
-        browser = await p.chromium.launch(headless=True,
-                                          args=launch_args)
-        context = await browser.new_context(
+    pool = await browsers.get_browser_pool()
+    async with pool.context(
             user_agent=random.choice(user_agents),
             viewport={"width": random.randint(1280, 1920), "height": random.randint(720, 1080)},
             locale=random.choice(["en-US", "en-GB", "en-NG", "en-CA"]),
@@ -153,7 +107,7 @@ async def get_tiktok_profile(username):
                 "longitude": random.uniform(-74.0, 3.4),
                 "latitude": random.uniform(40.7, 6.5)
             },
-            permissions=["geolocation"])
+            permissions=["geolocation"]) as context:
         await context.add_init_script("""
             Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
             Object.defineProperty(navigator, 'platform', {get: () => 'Win32'});
@@ -181,191 +135,178 @@ async def get_tiktok_profile(username):
                 await page.wait_for_selector('[data-e2e="followers-count"]', timeout=20000)
             except Exception as e:
                 logging.warning(f"Followers count selector not found for @{username}: {e}")
-                followers = 0
-
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await asyncio.sleep(3)
 
             html = await page.content()
-            soup = BeautifulSoup(html, "html.parser")
-
-            followers_tag = soup.find("strong", {"data-e2e": "followers-count"})
-            followers = extract_number(followers_tag.text) if followers_tag else 0
-            likes_tag = soup.find("strong", {"data-e2e": "likes-count"}) 
-            total_likes = extract_number(likes_tag.text) if likes_tag else 0 
-            bio_tag = soup.find("h2", {"data-e2e": "user-bio"}) 
-            bio = bio_tag.text.strip() if bio_tag else "" 
-
-            videos_data = [] 
-            for block in soup.find_all("div", {"data-e2e": "user-post-item"})[:10]: 
-                a_tag = block.find("a", href=True) 
-                video_url = a_tag["href"] if a_tag else None 
-                view_tag = block.find("strong", {"data-e2e": "video-views"}) 
-                views = extract_number(view_tag.text) if view_tag else 0 
-                if video_url and f"/@{username}/video" in video_url: 
-                    videos_data.append({"username": username, 
-                                        "profile_url": f"https://www.tiktok.com/@{username}", 
-                                        "followers": followers, 
-                                        "total_likes": total_likes, 
-                                        "bio": bio, 
-                                        "video_id": re.search(r"/video/(\d+)", video_url).group(1) if re.search(r"/video/(\d+)", video_url) else None,
-                                        "video_url": video_url, 
-                                        "video_views": views })
-            await asyncio.sleep(random.randint(5, 10))
-
-            await browser.close()
-
-            if videos_data:
-                logging.info(f"Found {len(videos_data)} videos for @{username}")
-                return videos_data
+            if refresh is None or refresh.needs_full(username, page_counters(html)):
+                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                await asyncio.sleep(3)
+                html = await page.content()
             else:
-                logging.warning(f"No videos found or profile inaccessible for @{username}")
-
+                logging.info(f"@{username} has no new videos, not scrolling.")
+            await asyncio.sleep(random.randint(5, 10))
+            return html
 
         except Exception as e:
             logging.error(f"Error fetching @{username}: {e}")
-            return []
-
-def process_load(username):
-    data = asyncio.run(get_tiktok_profile(username))
-    if not data:
+            return None
+
+
+def parse_profile(username, html, since_id=None):
+    """
+    Profile record and up to 10 video records from a landed profile page, or
+    None if it has no videos. With `since_id` only newer videos are returned.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    followers_tag = soup.find("strong", {"data-e2e": "followers-count"})
+    followers = extract_number(followers_tag.text) if followers_tag else 0
+    likes_tag = soup.find("strong", {"data-e2e": "likes-count"})
+    total_likes = extract_number(likes_tag.text) if likes_tag else 0
+    bio_tag = soup.find("h2", {"data-e2e": "user-bio"})
+    bio = bio_tag.text.strip() if bio_tag else ""
+
+    profile = records.TiktokProfile(
+        username=username,
+        profile_url=f"https://www.tiktok.com/@{username}",
+        followers=followers,
+        total_likes=total_likes,
+        bio=bio,
+    )
+    videos = []
+    for block in soup.find_all("div", {"data-e2e": "user-post-item"})[:10]:
+        a_tag = block.find("a", href=True)
+        video_url = a_tag["href"] if a_tag else None
+        view_tag = block.find("strong", {"data-e2e": "video-views"})
+        views = extract_number(view_tag.text) if view_tag else 0
+        video_id = re.search(r"/video/(\d+)", video_url) if video_url else None
+        if video_id and f"/@{username}/video" in video_url:
+            videos.append(records.TiktokVideo(
+                username=username,
+                video_id=video_id.group(1),
+                video_url=video_url,
+                video_views=views,
+            ))
+
+    if not videos:
+        # An empty page usually means a block or a private account; keep the stored profile
         logging.warning(f"No videos found or profile inaccessible for @{username}")
-        return
-
-    df = pd.DataFrame(data)
-    
-
+        return None
+    if since_id:
+        # IDs grow over time; pinned tiles that are older than the cursor drop out too
+        videos = [video for video in videos if int(video.video_id) > int(since_id)]
+    logging.info(f"Found {len(videos)} {'new ' if since_id else ''}videos for @{username}")
+    return profile, videos
+
+
+def to_batches(entries, since_ids=None) -> dict:
+    """
+    Profile and video batches from (username, html, landed_at) entries, live or
+    replayed. `since_ids` maps a username to its post cursor.
+    """
+    accounts = records.Batch(records.TiktokProfile)
+    posts = records.Batch(records.TiktokVideo)
+    for username, html, _ in entries:
+        parsed = parse_profile(username, html, (since_ids or {}).get(username))
+        if parsed:
+            accounts.append(parsed[0])
+            posts.extend(parsed[1])
+    return {"tiktok_user_data": accounts, "tiktok_post_data": posts}
+
+
+def store(batches: dict, snapshot: bool = True):
+    """
+    Transform and write one set of batches; `snapshot=False` when replaying
+    landed data. Returns True once the rows are written.
+    """
+    import psycopg2
+
+    if not len(batches["tiktok_user_data"]):
+        return False
+
+    tables = transform.run("tiktok", batches)
+    users = tables["tiktok_user_data"]
 
-    if df.empty:
-        logging.warning(f"No valid data for @{username}, skipping.")
-        return
-   
-    #==================== Type Cast and transformation ==============================
-    df = df.astype({
-    "followers": int,
-    "total_likes": int,
-    "video_views": int
-        })
-    df["username"] = df["username"].astype(str).fillna("no screen name").apply(lambda x: x.lower())
-    df["profile_url"] = df["profile_url"].astype(str).fillna("")
-    df['followers'] = df['followers'].fillna(0).astype(int)
-    df["total_likes"] = df["total_likes"].astype(int)
-    df["bio"] = df["bio"].apply(remove_emojis).astype(str).fillna(" ")
-    df["video_url"] = df["video_url"].astype(str)
-    df["video_views"] = df["video_views"].astype(int).fillna(0)
-    df["video_id"] = df["video_id"].astype(str).fillna("none")
-
-    logging.info(f"{df.dtypes}")
-    df_user = df[["username", "bio", "profile_url", "followers", "total_likes"]]
-    df_post = df[["username", "video_id", "video_url", "video_views"]]
-    user_records = [
-        (
-            str(row["username"]),
-            str(row["profile_url"]),
-            int(row["followers"]),
-            int(row["total_likes"]),
-            str(row["bio"])
-        )
-        for _, row in df_user.iterrows()
-    ]            
-    post_records = [
-            (
-                str(row["username"]),
-                str(row["video_id"]),
-                str(row["video_url"]),
-                int(row["video_views"])
-            )
-            for _, row in df_post.iterrows()
-        ]
-
-
-    engine = connect_to_database()
-    if engine:
+    try:
+        transform.load("tiktok", tables)
+        logging.info(f"Upserted {len(tables['tiktok_post_data'])} rows to tiktok_post_data.")
+        if snapshot:
+            snapshots.record("tiktok", users, "username", {"followers": "followers", "likes": "total_likes"})
+        profiles.refresh("tiktok", users.column("username").to_pylist())
+        return True
+    except psycopg2.Error as e:
+        logging.error(f"Database error: {e.pgerror or e}")
+        return False
+
+
+def write_profile(username, html, since_id=None):
+    """Land one scraped page, then parse and upsert it (videos newer than `since_id`). Returns True once it is stored."""
+    if not html:
+        logging.warning(f"No page fetched for @{username}")
+        return False
+    landed_at = landing.land("tiktok", username, html)
+    return store(to_batches([(username, html, landed_at)], {username: since_id}))
+
+
+async def scrape_batch(usernames):
+    """
+    Scrape profiles one after another on the shared browser pool, pausing between pages.
+
+    DB writes run in a worker thread so other stages on the same loop keep going.
+    Every account costs one page load even when the probe finds it unchanged
+    (see get_tiktok_profile). Returns the usernames whose page could not be fetched or stored, with the reason.
+    """
+    failed = {}
+    refresh = await asyncio.to_thread(probe.Probe, "tiktok", usernames)
+    for username in usernames:
+        html = await get_tiktok_profile(username, refresh)
+        since_id = (refresh.since(username) or {}).get("since_id")
+        if await asyncio.to_thread(write_profile, username, html, since_id):
+            refresh.seen(username, page_counters(html), refresh.due(username), newest_video_id(username, html))
+        else:
+            failed[username] = "page not fetched" if not html else "page not stored (blocked, private or DB error)"
+        await asyncio.sleep(random.randint(5, 10))
+    await asyncio.to_thread(refresh.save)
+    return failed
+
+
+def process_batch(usernames):
+    """Standalone entry point: one event loop and one browser for the whole batch. Returns the failed usernames."""
+    async def run():
         try:
-            with engine.cursor() as cursor:
-                #=== Create user table if not exists ======
-                cursor.execute(
-                    """CREATE TABLE IF NOT EXISTS tiktok_user_data(
-                    username VARCHAR(100) NOT NULL,
-                    profile_url TEXT,
-                    followers BIGINT,
-                    total_likes BIGINT,
-                    bio TEXT,
-                    PRIMARY KEY (username)
-                    );
-                    """
-                )
-                engine.commit()
-
-                #=== Create post table if not exists ======
-                cursor.execute(
-                    """CREATE TABLE IF NOT EXISTS tiktok_post_data(
-                    username VARCHAR(100) NOT NULL REFERENCES tiktok_user_data(username),
-                    video_id VARCHAR(100) NOT NULL,
-                    video_url TEXT,
-                    video_views INT,
-                    PRIMARY KEY (video_id)
-                    );
-                    """
-                )
-                engine.commit()
-
-                #=== Upsert User Data=======
-                upsert_stmt = """
-                    INSERT INTO tiktok_user_data (username, profile_url, followers, total_likes, bio)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (username) DO UPDATE SET
-                        profile_url = EXCLUDED.profile_url,
-                        followers = EXCLUDED.followers,
-                        total_likes = EXCLUDED.total_likes,
-                        bio = EXCLUDED.bio;
-                """
-                cursor.executemany(upsert_stmt, user_records)
-
-                #=== Upsert Post Data=======
-                upsert_stmt = """
-                    INSERT INTO tiktok_post_data (username, video_id, video_url, video_views)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (video_id) 
-                    DO UPDATE SET
-                        username = EXCLUDED.username,
-                        video_id = EXCLUDED.video_id,
-                        video_url = EXCLUDED.video_url,
-                        video_views = EXCLUDED.video_views;
-                """
-                cursor.executemany(upsert_stmt, post_records)
-
-                engine.commit()
-                logging.info(f"Upserted {len(post_records)} rows to tiktok_post_data.")
-        except psycopg2.Error as e:
-            engine.rollback()
-            logging.error(f"Database error: {e.pgerror or e}")
+            return await scrape_batch(usernames)
         finally:
-            cursor.close()
-            engine.close()
+            await browsers.close_browser_pool()
+
+    return asyncio.run(run())
+
+
+def process_load(username):
+    process_batch([username])
+
 
-  
 # ============ Test Run ============
 if __name__ == "__main__":
+    import pandas as pd
+    from dotenv import load_dotenv
 
-    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
     try:
-        # Create SQLAlchemy engine from environment variables
-        engine = create_engine(
-            f"postgresql+psycopg2://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}@"
-            f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}?sslmode=require")
-
         query = "SELECT tiktok_username AS username FROM username_search WHERE tiktok_username IS NOT NULL;"
 
-        names = pd.read_sql(query, engine)
+        with db.connection() as conn:
+            names = pd.read_sql(query, conn)
 
         usernames = (
             names["username"].astype(str).str.strip().str.lower().dropna().unique().tolist())
 
         logging.info(f"Loaded {len(usernames)} usernames from database.")
-        for users in usernames:
-            process_load(users)
-            time.sleep(random.randint(5, 10))
+        process_batch(scheduler.plan("tiktok", usernames))
+        metrics.refresh("tiktok")
     except Exception as e:
         logging.info(f"error reading username: {e}")
+    finally:
+        db.close_pool()
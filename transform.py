@@ -0,0 +1,141 @@
+import logging
+import threading
+
+import loader
+import records
+import textclean
+
+
+# ============================== Casts =====================================
+# kind -> DuckDB expression for one column of the raw rows
+CASTS = {
+    "str": "CAST({col} AS VARCHAR)",
+    # Missing counts stay NULL (unknown), not 0
+    "int": "TRY_CAST({col} AS BIGINT)",
+    "bool": "coalesce(TRY_CAST({col} AS BOOLEAN), false)",
+    "ts": "TRY_CAST({col} AS TIMESTAMP)",
+    "url": "rtrim(CAST({col} AS VARCHAR), '/')",
+    "handle": "lower(trim(CAST({col} AS VARCHAR)))",
+    # textclean modes: URLs, mentions, symbols and emojis / emojis only
+    "text": textclean.sql("{col}", "text"),
+    "emoji": textclean.sql("{col}", "emoji"),
+}
+
+
+# ============================== Specs =====================================
+# platform -> table -> (key, column kinds, hash_exclude), parents first.
+# Column names match the record fields in records.py.
+SPECS = {
+    "instagram": {
+        "insta_user_data": (["user_id"], {
+            "user_id": "str", "username": "str", "name": "emoji", "profile_url": "str",
+            "follower_count": "int", "bio": "text", "media_count": "int", "profile_picture_url": "url",
+        }, None),
+        "insta_post_data": (["post_id"], {
+            "post_id": "str", "post_caption": "text", "like_count": "int", "comments_count": "int",
+            "timestamp": "ts", "post_media_url": "url", "post_permalink": "str", "user_id": "str",
+        }, None),
+    },
+    "youtube": {
+        "youtube_user_data": (["channel_id"], {
+            "channel_id": "str", "username": "str", "channel_title": "str", "channel_description": "text",
+            "subscriber_count": "int", "total_view_count": "int", "total_video_count": "int",
+            "uploads_playlist_id": "str", "channel_created_at": "ts", "profile_url": "str",
+            "thumbnail_url": "str",
+        }, None),
+        "youtube_post_data": (["video_id"], {
+            "channel_id": "str", "video_id": "str", "video_title": "text", "video_description": "text",
+            "video_published_at": "ts", "video_url": "str", "video_views": "int", "video_likes": "int",
+            "video_comments": "int", "created_at": "ts", "updated_at": "ts",
+        }, ["created_at", "updated_at"]),
+    },
+    "tiktok": {
+        "tiktok_user_data": (["username"], {
+            "username": "handle", "profile_url": "str", "followers": "int", "total_likes": "int", "bio": "text",
+        }, None),
+        "tiktok_post_data": (["video_id"], {
+            "username": "handle", "video_id": "str", "video_url": "str", "video_views": "int",
+        }, None),
+    },
+    "x": {
+        "influencer_x": (["id"], {
+            "created_at": "ts", "username": "emoji", "id": "str", "bio": "text", "location": "str",
+            "profile_image_url": "str", "followers": "int", "is_verified": "bool", "published_at": "ts",
+            "text": "text", "likes": "int", "retweets": "int", "comments_count": "int",
+        }, None),
+    },
+}
+
+
+def select_sql(columns: dict[str, str]) -> str:
+    # Quoted: some columns are named like types ("timestamp", "text")
+    return "SELECT " + ",\n       ".join(
+        f'{CASTS[kind].format(col=quoted)} AS {quoted}'
+        for quoted, kind in ((f'"{column}"', kind) for column, kind in columns.items())
+    ) + "\nFROM raw"
+
+
+# ============================== DuckDB =====================================
+_duck = None
+_duck_lock = threading.Lock()
+
+
+def get_duck():
+    """
+    Process-wide in-memory DuckDB connection. Callers work on their own
+    `.cursor()` of it, which is safe to use from the ETL worker threads.
+    """
+    global _duck
+    with _duck_lock:
+        if _duck is None:
+            import duckdb
+
+            _duck = duckdb.connect()
+    return _duck
+
+
+def close_duck():
+    global _duck
+    with _duck_lock:
+        if _duck is not None:
+            _duck.close()
+            _duck = None
+
+
+# ============================== Stage =====================================
+def run(platform: str, batches: dict) -> dict:
+    """
+    Cast and clean each table's rows in one DuckDB pass.
+
+    `batches` maps table name to a records.Batch (or Arrow table); fields
+    missing from it become NULL columns. Returns one Arrow table per table in
+    SPECS[platform], ready for `load`.
+    """
+    import pyarrow as pa
+
+    tables = {}
+    duck = get_duck().cursor()
+    try:
+        for table, (_, columns, _) in SPECS[platform].items():
+            raw = batches[table]
+            raw = raw.to_arrow() if isinstance(raw, records.Batch) else raw
+            for column in columns:
+                if column not in raw.column_names:
+                    raw = raw.append_column(column, pa.nulls(len(raw)))
+            modes = [kind for kind in columns.values() if kind in textclean.MODES]
+            duck.register("raw", raw)
+            # fetch_arrow_table: .arrow() returns a RecordBatchReader from DuckDB 1.4 on
+            tables[table] = duck.execute(select_sql(columns), textclean.sql_params(modes)).fetch_arrow_table()
+            duck.unregister("raw")
+    finally:
+        duck.close()
+    logging.info(f"Transformed {platform}: " + ", ".join(f"{len(data)} {table}" for table, data in tables.items()))
+    return tables
+
+
+def load(platform: str, tables: dict) -> dict:
+    """Write the output of `run` in one transaction, parents first (SPECS order)."""
+    return loader.load_tables([
+        (table, tables[table], key, hash_exclude)
+        for table, (key, _, hash_exclude) in SPECS[platform].items()
+    ])
@@ -0,0 +1,225 @@
+import argparse
+import importlib
+import logging
+import os
+import socket
+import threading
+
+import pandas as pd
+
+import db
+import metrics
+import scheduler
+from profiles import norm
+
+
+# The ingest_jobs table is created with the rest of the schema in db.py.
+
+# platform -> username_search column holding its handles
+SEARCH_COLUMNS = {
+    "instagram": "instagram_username",
+    "youtube": "youtube_username",
+    "tiktok": "tiktok_username",
+    "x": "x_username",
+}
+
+# platform -> (module, function taking a list of handles and returning {handle: error} for the
+# ones that failed); imported only by workers of that platform
+HANDLERS = {
+    "instagram": ("insta", "main"),
+    "youtube": ("yt", "youtube_data"),
+    "tiktok": ("tik", "process_batch"),
+    "x": ("xuser", "process_batch"),
+}
+
+
+def worker_name() -> str:
+    """Identifies the lease holder: host, pid and the CI job when there is one."""
+    job = os.getenv("GITHUB_JOB", "")
+    return f"{socket.gethostname()}:{os.getpid()}{':' + job if job else ''}"
+
+
+# ============================== Producer =====================================
+def enqueue(platform: str, handles: list[str]) -> int:
+    """
+    Add handles to the queue. Finished jobs are re-opened for this round;
+    pending or running ones are left alone, so seeding twice is harmless.
+    """
+    with db.connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO ingest_jobs AS j (platform, handle)
+            SELECT %(platform)s, unnest(%(handles)s::text[])
+            ON CONFLICT (platform, handle) DO UPDATE
+            SET status = 'pending', attempts = 0, run_after = now(), last_error = NULL, updated_at = now()
+            WHERE j.status IN ('done', 'failed')
+        """, {"platform": platform, "handles": list(handles)})
+        queued = cur.rowcount
+    logging.info(f"Queued {queued} {platform} jobs.")
+    return queued
+
+
+def seed(platform: str) -> int:
+    """Queue every handle from username_search, highest refresh priority first."""
+    column = SEARCH_COLUMNS[platform]
+    with db.connection() as conn:
+        names = pd.read_sql(
+            f"SELECT DISTINCT {norm(column)} AS handle FROM username_search WHERE {column} IS NOT NULL", conn
+        )
+    return enqueue(platform, scheduler.plan(platform, names["handle"].dropna().tolist()))
+
+
+# ============================== Consumer =====================================
+# Jobs whose lease ran out on their last attempt (the job keeps killing its worker): give up on them
+EXPIRE_SQL = """
+    UPDATE ingest_jobs
+    SET status = 'failed', last_error = 'lease expired on the last attempt', lease_expires = NULL, updated_at = now()
+    WHERE platform = %(platform)s AND status = 'running' AND lease_expires < now() AND attempts >= max_attempts
+"""
+
+CLAIM_SQL = """
+    UPDATE ingest_jobs j
+    SET status = 'running', leased_by = %(worker)s, attempts = j.attempts + 1,
+        lease_expires = now() + make_interval(secs => %(lease)s), updated_at = now()
+    WHERE j.id IN (
+        SELECT id FROM ingest_jobs
+        WHERE platform = %(platform)s
+          AND ((status = 'pending' AND run_after <= now())
+               OR (status = 'running' AND lease_expires < now() AND attempts < max_attempts))
+        ORDER BY run_after, id
+        LIMIT %(batch)s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING j.id, j.handle
+"""
+
+
+def claim(platform: str, worker: str, batch: int = 10, lease: int = 900) -> list[tuple[int, str]]:
+    """
+    Lease up to `batch` jobs. SKIP LOCKED lets any number of workers claim at
+    once without blocking on, or double-taking, each other's rows; jobs whose
+    lease ran out (a killed worker) are picked up again until their attempts
+    run out, then marked failed.
+    """
+    with db.connection() as conn, conn.cursor() as cur:
+        cur.execute(EXPIRE_SQL, {"platform": platform})
+        cur.execute(CLAIM_SQL, {"platform": platform, "worker": worker, "batch": batch, "lease": lease})
+        return cur.fetchall()
+
+
+def heartbeat(job_ids: list[int], worker: str, lease: int = 900) -> int:
+    """Extend the lease on jobs this worker still holds."""
+    with db.connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            UPDATE ingest_jobs SET lease_expires = now() + make_interval(secs => %(lease)s)
+            WHERE id = ANY(%(ids)s) AND leased_by = %(worker)s AND status = 'running'
+        """, {"ids": job_ids, "worker": worker, "lease": lease})
+        return cur.rowcount
+
+
+def complete(job_ids: list[int], worker: str):
+    with db.connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            UPDATE ingest_jobs SET status = 'done', lease_expires = NULL, updated_at = now()
+            WHERE id = ANY(%(ids)s) AND leased_by = %(worker)s
+        """, {"ids": job_ids, "worker": worker})
+
+
+def fail(job_ids: list[int], worker: str, error: str, retry_base: int = 300):
+    """Put jobs back with exponential backoff, or mark them failed after max_attempts."""
+    with db.connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            UPDATE ingest_jobs
+            SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                run_after = now() + make_interval(secs => %(base)s * power(2, attempts - 1)),
+                last_error = left(%(error)s, 2000), lease_expires = NULL, updated_at = now()
+            WHERE id = ANY(%(ids)s) AND leased_by = %(worker)s
+        """, {"ids": job_ids, "worker": worker, "error": error, "base": retry_base})
+
+
+class Heartbeat:
+    """Background thread that keeps the current batch's lease alive while the handler runs."""
+
+    def __init__(self, job_ids: list[int], worker: str, lease: int):
+        self.job_ids, self.worker, self.lease = job_ids, worker, lease
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.lease / 3):
+            try:
+                heartbeat(self.job_ids, self.worker, self.lease)
+            except Exception as e:
+                logging.warning(f"Heartbeat failed for jobs {self.job_ids}: {e}")
+
+
+def work(platform: str, batch: int = 10, lease: int = 900, max_batches: int | None = None) -> int:
+    """Claim and process batches until the queue is empty. Returns the number of handles processed."""
+    module, function = HANDLERS[platform]
+    handler = getattr(importlib.import_module(module), function)
+    worker = worker_name()
+    processed = batches = 0
+    while max_batches is None or batches < max_batches:
+        jobs = claim(platform, worker, batch, lease)
+        if not jobs:
+            break
+        ids, handles = [job[0] for job in jobs], [job[1] for job in jobs]
+        logging.info(f"{worker} claimed {len(jobs)} {platform} jobs: {', '.join(handles)}")
+        try:
+            with Heartbeat(ids, worker, lease):
+                failures = handler(handles) or {}
+            # Only the handles the handler reports as failed are retried (or given up after max_attempts)
+            done = [job_id for job_id, handle in jobs if handle not in failures]
+            complete(done, worker)
+            for job_id, handle in jobs:
+                if handle in failures:
+                    fail([job_id], worker, failures[handle])
+            processed += len(done)
+            if len(done) < len(jobs):
+                logging.warning(f"{len(jobs) - len(done)} {platform} jobs failed: {', '.join(failures)}")
+        except Exception as e:
+            logging.error(f"{platform} batch failed: {e}")
+            fail(ids, worker, str(e))
+        batches += 1
+    logging.info(f"{worker} finished: {processed} {platform} handles processed.")
+    return processed
+
+
+def status() -> pd.DataFrame:
+    with db.connection() as conn:
+        return pd.read_sql("""
+            SELECT platform, status, count(*) AS jobs, max(attempts) AS max_attempts
+            FROM ingest_jobs GROUP BY platform, status ORDER BY platform, status
+        """, conn)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Postgres-backed ingestion queue")
+    parser.add_argument("command", choices=["seed", "work", "status"])
+    parser.add_argument("platforms", nargs="*", default=list(SEARCH_COLUMNS))
+    parser.add_argument("--batch", type=int, default=10)
+    parser.add_argument("--lease", type=int, default=900, help="seconds before an unrenewed job is reclaimed")
+    args = parser.parse_args()
+    try:
+        if args.command == "status":
+            print(status().to_string(index=False))
+        elif args.command == "seed":
+            for platform in args.platforms:
+                seed(platform)
+        else:
+            for platform in args.platforms:
+                if work(platform, args.batch, args.lease):
+                    metrics.refresh(platform)
+    finally:
+        db.close_pool()
@@ -1,229 +1,273 @@
-import tweepy
-
-
-import duckdb
-import pandas as pd
-import psycopg2
-import emoji
-
 import os
 import time
-from dotenv import load_dotenv
 import logging
 
-load_dotenv()
+import db
+import landing
+import mentions
+import metrics
+import probe
+import profiles
+import records
+import retry
+import scheduler
+import snapshots
+import transform
 
 #============================== Config =====================================
-logging.getLogger().setLevel(logging.INFO)
-bearer_token = os.getenv("x_bearer_token")
-client = tweepy.Client(bearer_token=bearer_token, wait_on_rate_limit=True)
-#=============================================================================
-def connect_to_database():
-    try:
-        engine = psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT"),
-            dbname=os.getenv("DB_NAME"),
-            password=os.getenv("DB_PASS"),
-            user=os.getenv("DB_USERNAME"),
-            sslmode="require"
-        )
-    except Exception as e:
-        logging.error(f"Error connecting to database: {e}")
-        return None
-    return engine
+_client = None
+
+
+def get_client():
+    """tweepy client, built on first use so importing this module stays cheap."""
+    global _client
+    if _client is None:
+        import tweepy
 
-def remove_emojis(text: str) -> str:
-    """Helper to strip emojis."""
-    return emoji.replace_emoji(text, replace="")
-def user_data(username):
+        bearer_token = os.getenv("X_BEARER_TOKEN") or os.getenv("x_bearer_token")
+        _client = tweepy.Client(bearer_token=bearer_token, wait_on_rate_limit=False)
+    return _client
+
+#=============================================================================
+def user_data(username, refresh=None):
     """
     Fetch user profile (and optionally tweets) from Twitter API.
 
     Args:
-        client: Tweepy client
         username (str): Twitter username
-        fetch_tweets (bool): If True, also fetch recent tweets
+        refresh (probe.Probe): If given, tweets are only fetched when the
+            tweet count moved or the account is due, and only the ones newer
+            than the stored since_id unless it is due
 
     Returns:
-        dict: user data
+        dict: user data; "tweets" is None when they were not fetched
     """
-    while True:
-        try:
-            # Get profile info
-            users_response = client.get_users(
-                usernames=[username],
-                user_fields=[
-                    "id", "name", "username", "description", 
-                    "public_metrics", "created_at", "verified", "location"
-                ],
-                expansions=["pinned_tweet_id"]
-            )
-            if not users_response.data:
-                logging.warning(f"No user data found for {username}")
-                return None
-
-            user = users_response.data[0]
-            user_data = {
-                "id": user.id,
-                "name": user.name,
-                "username": user.username,
-                "description": user.description,
-                "followers_count": user.public_metrics["followers_count"],
-                "following_count": user.public_metrics["following_count"],
-                "tweet_count": user.public_metrics["tweet_count"],
-                "listed_count": user.public_metrics["listed_count"],
-                "created_at": str(user.created_at),
-                "verified": user.verified,
-                "location": user.location,
-                "tweets": []  # always included for consistency
-            }
-
-            # Only fetch tweets if requested
-            if user_data:
-                tweets_response = client.get_users_tweets(
-                    user.id,
-                    max_results=5,
-                    tweet_fields=["created_at", "public_metrics", "text"]
-                )
-                if tweets_response.data:
-                    user_data["tweets"] = [
-                        {
-                            "id": tweet.id,
-                            "text": tweet.text,
-                            "created_at": str(tweet.created_at),
-                            "retweet_count": tweet.public_metrics["retweet_count"],
-                            "reply_count": tweet.public_metrics["reply_count"],
-                            "like_count": tweet.public_metrics["like_count"],
-                            "quote_count": tweet.public_metrics["quote_count"],
-                        }
-                        for tweet in tweets_response.data
-                    ]
-
-            return user_data
-
-        except tweepy.TooManyRequests as e:
-            # backoff
-            reset_time = int(e.response.headers.get("x-rate-limit-reset", time.time() + 900))
-            sleep_for = max(reset_time - int(time.time()), 60)
-            logging.warning(f"Rate limit hit. Sleeping {sleep_for}s...")
-            time.sleep(sleep_for)
-            continue
-        except Exception as e:
-            logging.error(f"Unexpected error fetching data for {username}: {e}")
+    import tweepy
+
+    client = get_client()
+    circuit = retry.breaker("x_api")
+    circuit.before_call()
+    try:
+        # Get profile info
+        users_response = client.get_users(
+            usernames=[username],
+            user_fields=[
+                "id", "name", "username", "description", 
+                "public_metrics", "created_at", "verified", "location", "profile_image_url"
+            ],
+            expansions=["pinned_tweet_id"]
+        )
+        circuit.success()
+        if not users_response.data:
+            logging.warning(f"No user data found for {username}")
             return None
 
+        user = users_response.data[0]
+        user_data = {
+            "id": user.id,
+            "name": user.name,
+            "username": user.username,
+            "description": user.description,
+            "followers_count": user.public_metrics["followers_count"],
+            "following_count": user.public_metrics["following_count"],
+            "tweet_count": user.public_metrics["tweet_count"],
+            "listed_count": user.public_metrics["listed_count"],
+            "created_at": str(user.created_at),
+            "verified": user.verified,
+            "location": user.location,
+            "profile_image_url": user.profile_image_url,
+            "tweets": []  # always included for consistency
+        }
 
-def x_data(username):
+        # Only fetch tweets if requested
+        counters = {"tweet_count": user_data["tweet_count"]}
+        if refresh is not None and not refresh.needs_full(username, counters):
+            logging.info(f"@{username} has no new tweets, not fetching them.")
+            user_data["tweets"] = None
+        else:
+            since_id = ((refresh.since(username) if refresh is not None else None) or {}).get("since_id")
+            tweets_response = client.get_users_tweets(
+                user.id,
+                max_results=5,
+                since_id=since_id,
+                tweet_fields=["created_at", "public_metrics", "text"]
+            )
+            if since_id and not tweets_response.data:
+                # Nothing newer (the count moved through a deletion); keep the stored latest tweet
+                user_data["tweets"] = None
+            if tweets_response.data:
+                user_data["tweets"] = [
+                    {
+                        "id": tweet.id,
+                        "text": tweet.text,
+                        "created_at": str(tweet.created_at),
+                        "retweet_count": tweet.public_metrics["retweet_count"],
+                        "reply_count": tweet.public_metrics["reply_count"],
+                        "like_count": tweet.public_metrics["like_count"],
+                        "quote_count": tweet.public_metrics["quote_count"],
+                    }
+                    for tweet in tweets_response.data
+                ]
+
+        return user_data
+
+    except tweepy.TooManyRequests as e:
+        # Park this account until the window resets instead of sleeping the whole run
+        reset_time = int(e.response.headers.get("x-rate-limit-reset", time.time() + 900))
+        retry_after = max(reset_time - time.time(), 60)
+        circuit.failure(retry_after)
+        raise retry.RetryLater(f"X rate limit for @{username}", retry_after)
+    except tweepy.TwitterServerError as e:
+        circuit.failure()
+        raise retry.RetryLater(f"X server error for @{username}: {e}")
+    except Exception as e:
+        logging.error(f"Unexpected error fetching data for {username}: {e}")
+        return None
+
+
+def to_record(data: dict) -> records.XAccount:
+    """The influencer_x row for one account: its profile and most recent tweet."""
+    latest = data["tweets"][0] if data.get("tweets") else {}
+    return records.XAccount(
+        created_at=data["created_at"],
+        username=data["username"],
+        id=data["id"],
+        bio=data["description"],
+        location=data["location"],
+        profile_image_url=data.get("profile_image_url"),
+        followers=data["followers_count"],
+        is_verified=data["verified"],
+        published_at=latest.get("created_at"),
+        text=latest.get("text"),
+        likes=latest.get("like_count"),
+        retweets=latest.get("retweet_count"),
+        comments_count=latest.get("reply_count"),
+    )
+
+
+def to_batches(entries) -> dict:
+    """Account and tweet batches from (username, raw user_data, landed_at) entries, live or replayed."""
+    accounts = records.Batch(records.XAccount)
+    tweets = records.Batch(records.XTweet)
+    unchanged = []
+    for _, data, _ in entries:
+        accounts.append(to_record(data))
+        if data.get("tweets") is None:
+            unchanged.append(str(data["id"]))
+        tweets.extend(
+            records.XTweet(data["username"], str(tweet["id"]), tweet["text"]) for tweet in data.get("tweets") or []
+        )
+    return {"influencer_x": accounts, "tweets": tweets, "unchanged": unchanged}
+
+
+TWEET_COLUMNS = ["published_at", "text", "likes", "retweets", "comments_count"]
+
+
+def keep_latest_tweets(accounts: records.Batch, ids: list[str]):
+    """Fill the tweet columns of accounts whose tweets were not fetched with the stored ones."""
+    with db.connection() as conn, conn.cursor() as cur:
+        # published_at as text: the batch holds it as the string the API returned
+        cur.execute(
+            "SELECT id, published_at::text, text, likes, retweets, comments_count FROM influencer_x WHERE id = ANY(%(ids)s)",
+            {"ids": ids},
+        )
+        stored = {row[0]: row[1:] for row in cur.fetchall()}
+    for i, account_id in enumerate(accounts.columns["id"]):
+        for column, value in zip(TWEET_COLUMNS, stored.get(str(account_id), ())):
+            accounts.columns[column][i] = value
+
+
+def store(batches: dict, snapshot: bool = True):
+    """
+    Transform and write one set of batches; `snapshot=False` when replaying
+    landed data. Returns True once the rows are written.
+    """
+    import pandas as pd
+    import psycopg2
+
+    accounts = batches["influencer_x"]
+    if not len(accounts):
+        return False
+    # Mentions in every fetched tweet, collected before the transform strips them
+    mention_edges = pd.concat([
+        mentions.extract(batches["tweets"].frame(), "x", "username", {"text": "tweet_id"}),
+        mentions.extract(accounts.frame("username", "bio"), "x", "username", {"bio": None}),
+    ], ignore_index=True)
+    #====================== Type Casting and Data cleansing ===========================
+    try:
+        if batches.get("unchanged"):
+            # Tweets were not refetched; keep the stored latest tweet instead of blanking it
+            keep_latest_tweets(accounts, batches["unchanged"])
+        tables = transform.run("x", batches)
+        users = tables["influencer_x"]
+        transform.load("x", tables)
+        if snapshot:
+            snapshots.record("x", users, "id", {"followers": "followers"})
+        profiles.refresh("x", users.column("username").to_pylist())
+        mentions.record(mention_edges)
+        return True
+    except psycopg2.DatabaseError as e:
+        logging.error(f"Database error writing {', '.join(map(str, accounts.columns['username']))}: {e}")
+        return False
+
+
+def x_data(username, refresh=None):
+    """Fetch, land and store one account; False only when the rows could not be written."""
     logging.info(f"getting data for @{username}")
-    data = user_data(username)
+    data = user_data(username, refresh)
 
     if not data:
         logging.warning(f"No data for {username}")
-        return
-
-    columns = ["created_at",
-               "username", "id", "bio", "location", "profile_image_url", 
-               "followers", "is_verified", "published_at", "text", 
-               "likes", "retweets", "comments_count"]             
-    df = pd.DataFrame(data)
-    column = [col for col in columns if col in df.columns]
-    df = df[column]
-    duck = duckdb.connect()
-    duck.register("df", df)
-    #====================== Type Casting and Data cleansing ===========================
-    df['username'] = df["username"].astype(str).apply(remove_emojis)
-    df['id'] = df["id"].astype(str)
-    df['bio'] = df["bio"].astype(str).apply(remove_emojis).replace(r'[@#"/]', ' ', regex=True)
-    df['location'] = df["location"].astype(str)
-    df['profile_image_url'] = df["profile_image_url"].astype(str)
-    df['followers'] = df["followers"].fillna(0).astype(int)
-    df['is_verified'] = df['is_verified'].astype(bool)
-    df['created_at'] = pd.to_datetime(df['created_at'], errors="coerce")
-    df['published_at'] = pd.to_datetime(df['published_at'], errors="coerce")
-    df['text'] = df["text"].astype(str).apply(remove_emojis).replace(r'[@#"/]', ' ', regex=True)
-    df['likes'] = df['likes'].astype(int)
-    df['retweets'] = df['retweets'].astype(int)
-    df['comments_count'] = df['comments_count'].astype(int)
-    df_clean = duck.execute("""
-                    SELECT created_at, username, id, 
-                        REPLACE(bio, '|', ' ') AS bio, 
-                        location, profile_image_url, 
-                        followers, is_verified, 
-                        published_at, 
-                        REPLACE(text, '|', ' ') AS text, 
-                        likes, retweets, comments_count 
-                    FROM df
-                """).fetchdf()
-
-    records = df_clean.to_records(index=False)
-    query = f"""
-                INSERT INTO influencer_x({', '.join(columns)})
-                VALUES ({', '.join(['%s'] * len(columns))})
-                
-                ON CONFLICT (id)  
-                DO UPDATE SET
-                    created_at = EXCLUDED.created_at,
-                    username = EXCLUDED.username,
-                    bio = EXCLUDED.bio,
-                    location = EXCLUDED.location,
-                    profile_image_url = EXCLUDED.profile_image_url,
-                    followers = EXCLUDED.followers,
-                    is_verified = EXCLUDED.is_verified,
-                    published_at = EXCLUDED.published_at,
-                    text = EXCLUDED.text,
-                    likes = EXCLUDED.likes,
-                    retweets = EXCLUDED.retweets,
-                    comments_count = EXCLUDED.comments_count"""
-
-    engine = connect_to_database()
-    if engine:
-        try:
-            with engine.cursor() as cursor:
-                cursor.execute("SET sceham_path TO PUBLIC") 
-                engine.commit() 
-
-                cursor.execute("""CREATE TABLE IF NOT EXISTS influencer_x(created_at TIMESTAMP,
-                            username Text, id Varchar(50) PRIMARY KEY, bio Text, location Text, profile_image_url Text, 
-                            followers INT, is_verified Boolean, published_at TIMESTAMP, text Text, likes INT, retweets INT, comments_count INT)"""
-                            )  
-                engine.commit()
-
-                cursor.executemany(query, records)
-                engine.commit()
-        except psycopg2.DatabaseError as e:
-            engine.rollback()
-        finally:
-            if cursor:
-                cursor.close()
-            if engine:
-                engine.close()
-
-
-#Test 
-from pathlib import Path
+        return True
+
+    if not store(to_batches([(username, data, landing.land("x", username, data))])):
+        return False
+    if refresh is not None:
+        newest = {"since_id": str(max(tweet["id"] for tweet in data["tweets"]))} if data["tweets"] else None
+        refresh.seen(username, {"tweet_count": data["tweet_count"]}, refresh.due(username), newest)
+    return True
+
+
+def process_batch(usernames):
+    """
+    Rate-limited accounts are parked on a deferred queue while the rest go ahead.
+    Returns the usernames that failed, with the reason.
+    """
+    refresh = probe.Probe("x", usernames)
+    # X rate windows are 15 minutes, so allow a full window of waiting
+    queue = retry.DeferredQueue("x", max_delay=1200)
+    failed = {
+        username: "database write failed"
+        for username, stored in queue.run(usernames, lambda username: x_data(username, refresh))
+        if not stored
+    }
+    refresh.save()
+    failed.update(queue.failed)
+    return failed
+
+
 if __name__ == "__main__":
-    try:
-        # Create SQLAlchemy engine from environment variables
-        conn = psycopg2.connect(
-        host=os.getenv("DB_HOST"),
-        port=os.getenv("DB_PORT"),
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USERNAME"),
-        password=os.getenv("DB_PASS"),
-        sslmode="require")
+    import pandas as pd
+    from dotenv import load_dotenv
 
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
         query = "SELECT x_username FROM username_search WHERE x_username IS NOT NULL;"
-        names = pd.read_sql(query, conn)
+        with db.connection() as conn:
+            names = pd.read_sql(query, conn)
 
         username = (
             names["x_username"].astype(str).str.strip().str.lower().dropna().unique().tolist())
         
-        usernames = username.lstrip("@")
+        usernames = [u.lstrip("@") for u in username]
 
         logging.info(f"Loaded {len(usernames)} usernames from database.")
-    
-        x_data(usernames)
+
+        process_batch(scheduler.plan("x", usernames))
+        metrics.refresh("x")
     except Exception as e:
         logging.info(f"error reading usernames: {e}")
+    finally:
+        db.close_pool()
 